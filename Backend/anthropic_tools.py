@@ -0,0 +1,54 @@
+"""
+Converts the MCP tool catalog into Anthropic tool definitions.
+
+The converted list is memoised per catalog version, so every chat request
+reuses the same prebuilt definitions until some server's tool list changes.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from mcp.types import Tool
+
+log = logging.getLogger(__name__)
+
+_EMPTY_SCHEMA: Dict[str, Any] = {"type": "object", "properties": {}}
+
+
+def to_anthropic_tool(tool: Tool) -> Dict[str, Any]:
+    """Map one MCP `Tool` onto Anthropic's {name, description, input_schema}."""
+    schema = dict(getattr(tool, "inputSchema", None) or _EMPTY_SCHEMA)
+    schema.setdefault("type", "object")
+    return {
+        "name": tool.name,
+        "description": getattr(tool, "description", "") or "",
+        "input_schema": schema,
+    }
+
+
+class AnthropicToolCache:
+    """Prebuilt Anthropic tool list, rebuilt only when the catalog version moves."""
+
+    def __init__(self) -> None:
+        self._version: Optional[int] = None
+        self._tools: List[Dict[str, Any]] = []
+        self._schemas: Dict[str, Dict[str, Any]] = {}
+
+    async def get(self, client_mgr) -> List[Dict[str, Any]]:
+        # list_tools() is a dictionary walk unless a server entry is stale, in
+        # which case it refreshes that entry and bumps the catalog version.
+        tools = await client_mgr.list_tools()
+        version = client_mgr.catalog_version
+        if version != self._version:
+            self._tools = [to_anthropic_tool(t) for t in tools]
+            self._schemas = {t["name"]: t["input_schema"] for t in self._tools}
+            self._version = version
+            log.info("rebuilt Anthropic tool definitions (v%d, %d tools)",
+                     version, len(self._tools))
+        return self._tools
+
+    def schema(self, name: str) -> Dict[str, Any]:
+        """Input schema of a tool from the last build (empty if unknown)."""
+        return self._schemas.get(name, {})
@@ -5,23 +5,30 @@ from __future__ import annotations
 
 import asyncio
 import dataclasses
+import hashlib
+import importlib.util
 import json
 import logging
 import os
 import time
 from pathlib import Path
-from typing import Any, Dict, List, get_origin
+from typing import Any, Dict, List, Optional
 
 import httpx
 from anthropic import AsyncAnthropic
+from anthropic_tools import AnthropicToolCache
 from client_manager import MCPClientManager
+from compaction import compact
+from conversation_store import ConversationStore
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from result_cache import ResultCache, load_policies
+from tool_index import ToolIndex, conversation_text, tools_in
 
-from init import _normalise_server, init_mcp
+from init import init_mcp_async, normalise_servers
 
 # ─────────────────── env / logging ───────────────────
 
@@ -31,12 +38,51 @@ log = logging.getLogger("app")
 
 SANDBOX_ID    = os.getenv("SANDBOX_ID",  "6XEJOvlItX4UIGOB2s0Z")
 HANDSHAKE_URL = os.getenv("HANDSHAKE_URL",
-                          "https://api-rough-bush-2430.fly.dev/handshake")
+                          os.getenv("CENTRAL_API_URL", "https://api-rough-bush-2430.fly.dev")
+                          + "/handshake")
 BASE_URL      = os.getenv("BASE_URL",    "http://localhost:8000")
-CONFIG_CHECK_INTERVAL = 60  # Check for config changes every 60 seconds
+CONFIG_CHECK_INTERVAL = 60   # first config check 60 seconds after boot …
+CONFIG_CHECK_MIN      = 15   # … then poll this fast right after a change …
+CONFIG_CHECK_MAX      = 600  # … backing off to this while the config is stable
+HANDSHAKE_HTTP2 = importlib.util.find_spec("h2") is not None  # httpx needs h2 for HTTP/2
+MCP_MAX_INFLIGHT = int(os.getenv("MCP_MAX_INFLIGHT", "8"))  # per-server request cap
+MCP_CATALOG_PATH = os.getenv("MCP_CATALOG_PATH", "mcp_catalog.json")  # tool-list snapshot
+MCP_LAZY         = os.getenv("MCP_LAZY", "0").lower() in ("1", "true", "yes")
+MCP_IDLE_TIMEOUT = float(os.getenv("MCP_IDLE_TIMEOUT", "600"))  # lazy: stop idle servers (s)
+MCP_MAX_RSS_MB   = float(os.getenv("MCP_MAX_RSS_MB", "0")) or None  # lazy: evict LRU above
+MCP_CACHE        = os.getenv("MCP_CACHE", "1").lower() in ("1", "true", "yes")  # tool results
+MCP_CACHE_TTL    = float(os.getenv("MCP_CACHE_TTL", "0"))            # default TTL (s), 0 = per policy only
+MCP_CACHE_MAX_ENTRIES = int(os.getenv("MCP_CACHE_MAX_ENTRIES", "1024"))
+MCP_CACHE_POLICY = os.getenv("MCP_CACHE_POLICY", "cache_policy.json")  # per-tool/server TTLs
+
+MODEL      = "claude-3-5-sonnet-20241022"
+MAX_TOKENS = 1000
+MAX_TOOL_ITERATIONS = max(1, int(os.getenv("MAX_TOOL_ITERATIONS", "8")))  # agent-loop turns
+TOOL_TOP_K  = int(os.getenv("TOOL_TOP_K", "20"))  # tools sent to the model per request, 0 = all
+TOOL_PINNED = [t.strip() for t in os.getenv("TOOL_PINNED", "").split(",") if t.strip()]
+HISTORY_TOKEN_BUDGET  = int(os.getenv("HISTORY_TOKEN_BUDGET", "60000"))  # est. tokens of history per call
+TOOL_RESULT_MAX_CHARS = int(os.getenv("TOOL_RESULT_MAX_CHARS", "4000"))  # older tool output excerpt
+CONVERSATION_DB  = os.getenv("CONVERSATION_DB", "")  # SQLite file; empty = memory only
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", str(24 * 3600)))  # idle expiry (s)
+BATCH_CONCURRENCY     = int(os.getenv("BATCH_CONCURRENCY", "8"))       # /tools/execute/batch default …
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))  # … and ceiling per request
 
 anthropic_async = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-client_mgr      = MCPClientManager()
+client_mgr      = MCPClientManager(
+    max_inflight=MCP_MAX_INFLIGHT,
+    lazy=MCP_LAZY,
+    idle_timeout=MCP_IDLE_TIMEOUT,
+    max_rss_mb=MCP_MAX_RSS_MB,
+    catalog_path=MCP_CATALOG_PATH,
+    result_cache=ResultCache(
+        ttl=MCP_CACHE_TTL,
+        max_entries=MCP_CACHE_MAX_ENTRIES,
+        policies=load_policies(MCP_CACHE_POLICY),
+    ) if MCP_CACHE else None,
+)
+tool_defs       = AnthropicToolCache()
+tool_index      = ToolIndex()
+conversations   = ConversationStore(CONVERSATION_DB or None, idle_expiry=CONVERSATION_TTL)
 
 POLICY_PROMPT = """
 You are connected to multiple MCP tool servers.
@@ -47,31 +93,38 @@ Make sure to give the desired input and prompt the user of that input when neede
 SYSTEM_PROMPT: str | None = None
 LAST_CONFIG_HASH: str | None = None
 
+http_client: httpx.AsyncClient | None = None  # pooled, created on startup
+HANDSHAKE_ETAG: str | None = None             # validator of the last applied response
+HANDSHAKE_DIGEST: str | None = None           # sha256 of the last applied response body
+
+MCP_CONFIG_PATH = Path("mcp.json")       # last-known normalised config
+BOOT_STARTED    = time.monotonic()
+BOOT_TIMINGS: Dict[str, float] = {}     # boot phase → seconds since process start
+
+CACHE_BREAKPOINT = {"type": "ephemeral"}  # Anthropic prompt-cache marker
+USAGE_FIELDS = ("input_tokens", "output_tokens",
+                "cache_creation_input_tokens", "cache_read_input_tokens")
+MODEL_USAGE: Dict[str, int] = dict.fromkeys(("requests", *USAGE_FIELDS), 0)  # since start
+
 # ─────────────────── pydantic models ───────────────────
 
 
 class ChatRequest(BaseModel):
     message: str
-    history: List[Dict[str, Any]] = []
+    conversation_id: str | None = None      # continue a server-side conversation
+    history: List[Dict[str, Any]] = []      # legacy: client-held history, used when
+                                            # the conversation is new or unknown
 
 
 class ToolCallResult(BaseModel):
     content: List[Dict[str, Any]]
 
-# ─────────────────── helpers ───────────────────
 
+class ToolCall(BaseModel):
+    name: str
+    arguments: Dict[str, Any] = {}
 
-def _py_to_json_type(tp: Any) -> str:
-    origin = get_origin(tp) or tp
-    if origin is int:
-        return "integer"
-    if origin in (float, complex):
-        return "number"
-    if origin is bool:
-        return "boolean"
-    if origin in (list, tuple, set):
-        return "array"
-    return "string"
+# ─────────────────── helpers ───────────────────
 
 
 def _to_json_safe(o: Any) -> Any:
@@ -89,33 +142,172 @@ def _to_json_safe(o: Any) -> Any:
     return str(o)
 
 
+def _tool_result_content(raw: Any) -> Any:
+    """Shape a raw MCP result as Anthropic tool_result content."""
+    if isinstance(raw, list) and all(
+        isinstance(x, dict) and "type" in x for x in raw
+    ):
+        return raw
+    return json.dumps(_to_json_safe(raw), ensure_ascii=False)
+
+
+async def _run_tool(name: str, args: Dict[str, Any]) -> tuple[Any, str]:
+    """Call one MCP tool and return (tool_result content, status)."""
+    try:
+        raw = await client_mgr.call_tool(name, args)
+        status = "success"
+    except Exception as exc:
+        log.error("Error calling tool %s: %s", name, exc)
+        error_msg = str(exc)
+
+        # Provide more helpful error messages for validation errors
+        if "validation error" in error_msg.lower():
+            raw = [{"type": "text", "text": f"Missing required information: {error_msg}"}]
+        else:
+            raw = [{"type": "text", "text": f"Error: {error_msg}"}]
+        status = "error"
+    return _tool_result_content(raw), status
+
+
+def _tool_result_block(tool_use_id: str, content: Any, status: str) -> Dict[str, Any]:
+    block = {"type": "tool_result", "tool_use_id": tool_use_id, "content": content}
+    if status == "error":
+        block["is_error"] = True
+    return block
+
+
+def _open_conversation(req: ChatRequest) -> tuple[str, List[Dict[str, Any]]]:
+    """(conversation id, stored or client-sent history + the new user message)."""
+    conversation_id = req.conversation_id or conversations.new_id()
+    messages = conversations.load(conversation_id) if req.conversation_id else []
+    if not messages and req.history:
+        messages = [{"role": m["role"], "content": m["content"]} for m in req.history]
+    messages.append({"role": "user", "content": req.message})
+    return conversation_id, messages
+
+
+def _assistant_message(content: List[Any]) -> Dict[str, Any]:
+    """Model output as a history entry, exactly as it has to be sent back."""
+    return {"role": "assistant", "content": [p.model_dump(exclude_none=True) for p in content]}
+
+
+async def _select_tools(conversation_id: str, messages: List[Dict[str, Any]]
+                        ) -> tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Anthropic tool definitions for one chat request – the catalog entries
+    most relevant to the conversation, plus pinned tools, any tool the
+    conversation has already used and every tool selected for it before –
+    and the selection to store with the conversation. The selection is
+    sticky (it only grows), so the tools block – the start of the
+    prompt-cache prefix – stays the same across requests.
+    """
+    tools_json = await tool_defs.get(client_mgr)
+    tool_index.sync(tools_json, client_mgr.catalog_version)
+    return tool_index.select(
+        tools_json, conversation_text(messages), TOOL_TOP_K,
+        pinned=[*TOOL_PINNED, *tools_in(messages)],
+        previous=conversations.tool_names(conversation_id),
+    )
+
+
+def _with_breakpoint(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of `message` whose last content block carries a cache breakpoint."""
+    content = message["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    if not content:
+        return message
+    return {**message, "content": [*content[:-1], {**content[-1], "cache_control": CACHE_BREAKPOINT}]}
+
+
+def _model_request(messages: List[Dict[str, Any]],
+                   tools_json: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Keyword arguments for messages.create / messages.stream, shared by both
+    chat paths. Tools, system prompt and history always go out in the same
+    order, with cache breakpoints after the tools, after the system prompt
+    and on the newest message, so each turn re-reads the previous prefix
+    from Anthropic's prompt cache. History is compacted to the token budget
+    first (the latest exchange stays intact). Inputs are not mutated.
+    """
+    messages = compact(messages, HISTORY_TOKEN_BUDGET, TOOL_RESULT_MAX_CHARS)
+    request: Dict[str, Any] = {
+        "model": MODEL,
+        "max_tokens": MAX_TOKENS,
+        "system": [{"type": "text", "text": SYSTEM_PROMPT or POLICY_PROMPT,
+                    "cache_control": CACHE_BREAKPOINT}],
+        "messages": [*messages[:-1], _with_breakpoint(messages[-1])],
+    }
+    if tools_json:
+        request["tools"] = [*tools_json[:-1],
+                            {**tools_json[-1], "cache_control": CACHE_BREAKPOINT}]
+    return request
+
+
+def _record_usage(totals: Dict[str, int], usage: Any) -> None:
+    """Add one model response's token usage to `totals` and MODEL_USAGE."""
+    for field in USAGE_FIELDS:
+        n = getattr(usage, field, None) or 0
+        totals[field] = totals.get(field, 0) + n
+        MODEL_USAGE[field] += n
+
+
+def _finish_usage(totals: Dict[str, int], path: str) -> None:
+    MODEL_USAGE["requests"] += 1
+    log.info("%s usage: in=%d out=%d cache_write=%d cache_read=%d", path,
+             *(totals.get(f, 0) for f in USAGE_FIELDS))
+
+
 def _hash_config(config: Dict[str, Any]) -> str:
     """Create a hash of the config to detect changes."""
     return json.dumps(config, sort_keys=True)
 
 
-async def _handshake(include_base_url: bool = True) -> Dict[str, Any]:
+def _http() -> httpx.AsyncClient:
+    """The shared keep-alive client (created lazily if startup has not run)."""
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(
+            http2=HANDSHAKE_HTTP2,
+            timeout=15,
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=2,
+                                keepalive_expiry=CONFIG_CHECK_MAX + 60),
+        )
+    return http_client
+
+
+async def _handshake(include_base_url: bool = True,
+                     conditional: bool = False) -> Optional[Dict[str, Any]]:
     """
     Perform handshake with the server to get configuration.
     
     Args:
         include_base_url: Whether to include base_url in the handshake request.
                          Set to False for config checks to avoid overwriting.
+        conditional: Return None – without normalising or touching mcp.json –
+                     when the response matches the last applied one (304 on
+                     If-None-Match, or an identical body hash).
     """
+    global SYSTEM_PROMPT, LAST_CONFIG_HASH, HANDSHAKE_ETAG, HANDSHAKE_DIGEST
+
     handshake_data = {"sandbox_id": SANDBOX_ID}
     if include_base_url:
         handshake_data["base_url"] = BASE_URL
-        
-    async with httpx.AsyncClient() as s:
-        resp = await s.post(
-            HANDSHAKE_URL,
-            json=handshake_data,
-            timeout=15,
-        )
-        resp.raise_for_status()
-        data: Dict[str, Any] = resp.json()
 
-    global SYSTEM_PROMPT, LAST_CONFIG_HASH
+    headers = {}
+    if conditional and HANDSHAKE_ETAG:
+        headers["If-None-Match"] = HANDSHAKE_ETAG
+
+    resp = await _http().post(HANDSHAKE_URL, json=handshake_data, headers=headers)
+    # before raise_for_status: httpx treats 304 as an (unfollowed) redirect error
+    if conditional and resp.status_code == 304:
+        return None
+    resp.raise_for_status()
+    digest = hashlib.sha256(resp.content).hexdigest()
+    if conditional and digest == HANDSHAKE_DIGEST:
+        return None
+    data: Dict[str, Any] = resp.json()
+
     SYSTEM_PROMPT = (
         (data.get("system_prompt") or data.get("systemPrompt") or "") +
         "\n\n" + POLICY_PROMPT
@@ -127,65 +319,127 @@ async def _handshake(include_base_url: bool = True) -> Dict[str, Any]:
         or {}
     )
     repo = Path("./mcp_sandboxes").resolve()
-    servers: Dict[str, Dict[str, Any]] = {}
+    local: Dict[str, Dict[str, Any]] = {}
 
     for name, conf in raw.items():
         if "url" in conf and "command" not in conf:
             log.warning("Skipping remote MCP server '%s' (%s)", name, conf["url"])
             continue
-        norm, _ = _normalise_server(name, conf, repo)
-        servers[name] = norm
+        local[name] = conf
+
+    # Repos are cloned with async git subprocesses, all concurrently
+    servers, _ = await normalise_servers(local, repo)
 
     # Update the config hash
     LAST_CONFIG_HASH = _hash_config(servers)
     
     log.info("normalised mcpServers: %s", json.dumps(servers, indent=2))
-    Path("mcp.json").write_text(json.dumps({"mcpServers": servers}, indent=2))
+    MCP_CONFIG_PATH.write_text(json.dumps(
+        {"mcpServers": servers, "systemPrompt": SYSTEM_PROMPT}, indent=2))
+
+    # Only remember the response once it is fully applied
+    HANDSHAKE_ETAG, HANDSHAKE_DIGEST = resp.headers.get("etag"), digest
     return servers
 
 
+def _load_cached_config() -> Dict[str, Any]:
+    """Last-known servers (and system prompt) written by a previous handshake."""
+    global SYSTEM_PROMPT
+    try:
+        cached = json.loads(MCP_CONFIG_PATH.read_text())
+    except (OSError, ValueError):
+        return {}
+    SYSTEM_PROMPT = cached.get("systemPrompt") or SYSTEM_PROMPT
+    return cached.get("mcpServers") or {}
+
+
+def _boot_mark(phase: str) -> None:
+    BOOT_TIMINGS[phase] = round(time.monotonic() - BOOT_STARTED, 3)
+    log.info("boot: %s at %.2fs", phase, BOOT_TIMINGS[phase])
+
+
+async def _boot_pipeline():
+    """
+    Single startup path: start the last-known servers straight from disk,
+    run one handshake concurrently, then reconcile whatever differs.
+    """
+    global LAST_CONFIG_HASH
+
+    handshake = asyncio.create_task(_handshake())
+
+    cached = _load_cached_config()
+    _boot_mark("cached_config_loaded")
+    if cached:
+        client_mgr._cfg = cached
+        await client_mgr.initialize()
+        _boot_mark("servers_started")
+
+    try:
+        servers = await handshake
+        _boot_mark("handshake_done")
+    except Exception as exc:
+        log.error("Handshake failed – keeping last-known config (%s)", exc)
+        servers = cached
+
+    actions = await client_mgr.reconcile(servers)
+    LAST_CONFIG_HASH = _hash_config(servers)
+    _boot_mark("reconciled")
+    log.info("boot reconcile: %s", {k: len(v) for k, v in actions.items()})
+
+    await client_mgr.wait_ready()
+    _boot_mark("servers_booted")
+
+
 async def _check_config_changes():
     """
     Periodically check for configuration changes from the handshake endpoint.
     If changes are detected, reinitialize the MCP client.
+
+    The interval doubles (up to CONFIG_CHECK_MAX) while the config is stable
+    and drops to CONFIG_CHECK_MIN right after a change.
     """
-    global LAST_CONFIG_HASH
-    
+    global LAST_CONFIG_HASH, HANDSHAKE_ETAG, HANDSHAKE_DIGEST
+
+    # The boot pipeline has just handshaken – wait a full interval first
+    interval = CONFIG_CHECK_INTERVAL
     while True:
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, CONFIG_CHECK_MAX)
         try:
             log.info("Checking for configuration changes...")
             
             # Get current config without base_url to avoid overwriting
-            data = await _handshake(include_base_url=False)
-            
-            # Calculate hash of new config
+            data = await _handshake(include_base_url=False, conditional=True)
+            if data is None:
+                log.info("No configuration changes detected (next check in %ds)", interval)
+                continue
+
+            # Compare against what is actually running (_handshake has
+            # already refreshed LAST_CONFIG_HASH by now)
             new_hash = _hash_config(data)
-            
-            # If config has changed, reinitialize
-            if LAST_CONFIG_HASH != new_hash:
-                log.info("Configuration changes detected, reinitializing...")
-                
-                # Update the client manager configuration
-                client_mgr._cfg = data
-                
-                # Close existing connections
-                await client_mgr.close()
-                
-                # Reinitialize with new config
-                await client_mgr.initialize()
-                
+
+            # If config has changed, reconcile only the servers that differ
+            if _hash_config(client_mgr._cfg) != new_hash:
+                log.info("Configuration changes detected, reconciling...")
+
+                actions = await client_mgr.reconcile(data)
+
                 # Update the stored hash
                 LAST_CONFIG_HASH = new_hash
-                
-                log.info("Reinitialization complete with new configuration")
+
+                log.info(
+                    "Reconcile complete: +%d -%d ~%d (=%d untouched)",
+                    len(actions["added"]), len(actions["removed"]),
+                    len(actions["changed"]), len(actions["unchanged"]),
+                )
+                interval = CONFIG_CHECK_MIN
             else:
                 log.info("No configuration changes detected")
                 
         except Exception as e:
             log.error(f"Error checking for configuration changes: {str(e)}")
-            
-        # Wait for the next check interval
-        await asyncio.sleep(CONFIG_CHECK_INTERVAL)
+            # Don't let a half-applied response short-circuit the next check
+            HANDSHAKE_ETAG = HANDSHAKE_DIGEST = None
 
 # ─────────────────── FastAPI ───────────────────
 
@@ -201,26 +455,47 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def _startup():
-    client_mgr._cfg = await _handshake()
-    await client_mgr.initialize()
-    
-    # Start the background task to check for config changes
-    asyncio.create_task(_check_config_changes())
+    _http()  # open the pooled handshake client before the first request
+
+    async def _boot_then_poll():
+        try:
+            await _boot_pipeline()
+        except Exception as exc:
+            log.exception("Boot pipeline failed: %s", exc)
+        # Start checking for config changes once boot has settled
+        await _check_config_changes()
+
+    # Run in the background so the HTTP server accepts requests right away
+    app.state.boot_task = asyncio.create_task(_boot_then_poll())
 
 
 @app.on_event("shutdown")
 async def _shutdown():
+    boot_task = getattr(app.state, "boot_task", None)
+    if boot_task is not None:
+        boot_task.cancel()
     await client_mgr.close()
+    conversations.close()
+    if http_client is not None:
+        await http_client.aclose()
 
 # ─────────────────── utility endpoints ───────────────────
 
 
 @app.get("/health")
 async def health():
+    server_status = client_mgr.server_status()
     return {
         "status": "ok",
         "servers": len(client_mgr._cfg),
+        "servers_ready": sum(s["state"] == "ready" for s in server_status.values()),
         "sdk_connected": client_mgr.initialized,
+        "mcp_servers": server_status,
+        "tool_collisions": client_mgr.tool_collisions(),
+        "result_cache": client_mgr.cache_stats(),
+        "model_usage": MODEL_USAGE,
+        "conversations": conversations.stats(),
+        "boot": BOOT_TIMINGS,
     }
 
 
@@ -238,6 +513,42 @@ async def exec_tool(req: Dict[str, Any]):
     res = await client_mgr.call_tool(req["name"], req.get("arguments", {}))
     return {"content": res}
 
+
+@app.post("/tools/execute/batch")
+async def exec_tool_batch(calls: List[ToolCall], concurrency: int = BATCH_CONCURRENCY):
+    """
+    Run many tool calls at once and stream one NDJSON line per call, in
+    completion order. At most `concurrency` calls of this request run at a
+    time; each server's own in-flight cap still applies underneath.
+    """
+    if not client_mgr.initialized:
+        raise HTTPException(503, "MCP not ready")
+    gate = asyncio.Semaphore(max(1, min(concurrency, BATCH_MAX_CONCURRENCY)))
+
+    async def _one(index: int, call: ToolCall) -> Dict[str, Any]:
+        async with gate:
+            started = time.perf_counter()
+            try:
+                res = await client_mgr.call_tool(call.name, call.arguments)
+                out = {"status": "success", "content": _to_json_safe(res)}
+            except Exception as exc:
+                out = {"status": "error", "error": str(exc) or type(exc).__name__}
+            elapsed = time.perf_counter() - started
+        return {"index": index, "name": call.name, **out,
+                "elapsed_ms": round(elapsed * 1000, 1)}
+
+    async def _lines():
+        tasks = [asyncio.create_task(_one(i, c)) for i, c in enumerate(calls)]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield json.dumps(await done, ensure_ascii=False) + "\n"
+        finally:
+            # client went away – don't leave calls running for nobody
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
 # ─────────────────── main chat (non-stream) ───────────────────
 
 
@@ -246,79 +557,48 @@ async def chat(req: ChatRequest):
     if not client_mgr.initialized:
         raise HTTPException(503, "MCP not ready")
 
-    # Build Anthropic-style tool list with JSON-schemas
-    tools_json: List[Dict[str, Any]] = []
-    for tool in await client_mgr.list_tools():
-        # In the tools endpoint or where you define your tools
-        schema = {"type": "object", "properties": {}, "required": []}
-        for arg in getattr(tool, "arguments", []):
-            jtype = _py_to_json_type(getattr(arg, "type_", str) or str)
-            schema["properties"][arg.name] = {
-                "type": jtype,
-                "description": getattr(arg, "description", "") or "",
-            }
-            if getattr(arg, "required", True) is not False:
-                schema["required"].append(arg.name)
+    conversation_id, messages = _open_conversation(req)
 
-        tools_json.append(
-            {
-                "name": tool.name,
-                "description": getattr(tool, "description", "") or "",
-                "input_schema": schema,
-            }
-        )
-
-    messages = [{"role": "user", "content": req.message}]
+    # Anthropic-style tool list: the catalog subset relevant to this chat
+    tools_json, selected = await _select_tools(conversation_id, messages)
     tools_used: List[str] = []
+    usage: Dict[str, int] = {}
 
-    assistant = await anthropic_async.messages.create(
-        model="claude-3-5-sonnet-20241022",
-        max_tokens=1000,
-        messages=messages,
-        system=SYSTEM_PROMPT,
-        tools=tools_json,
-    )
-
-    for item in assistant.content:
-        if item.type != "tool_use":
-            continue
-        tools_used.append(item.name)
-
-        try:
-            raw = await client_mgr.call_tool(item.name, item.input or {})
-        except Exception as exc:
-            raw = {"error": str(exc)}
+    # Agent loop: every tool_use of a turn runs concurrently and all of their
+    # tool_results go back together, until the model stops asking for tools.
+    for _ in range(MAX_TOOL_ITERATIONS):
+        assistant = await anthropic_async.messages.create(
+            **_model_request(messages, tools_json)
+        )
+        _record_usage(usage, assistant.usage)
 
-        if isinstance(raw, list) and all(
-            isinstance(x, dict) and "type" in x for x in raw
-        ):
-            result_content = raw
-        else:
-            safe = _to_json_safe(raw)
-            result_content = json.dumps(safe, ensure_ascii=False)
+        calls = [item for item in assistant.content if item.type == "tool_use"]
+        if not calls:
+            messages.append(_assistant_message(assistant.content))
+            break
+        tools_used += [c.name for c in calls]
 
+        results = await asyncio.gather(
+            *(_run_tool(c.name, c.input or {}) for c in calls)
+        )
         messages += [
-            {"role": "assistant", "content": [item.model_dump()]},
+            _assistant_message(assistant.content),
             {
                 "role": "user",
                 "content": [
-                    {
-                        "type": "tool_result",
-                        "tool_use_id": item.id,
-                        "content": result_content,
-                    }
+                    _tool_result_block(c.id, content, status)
+                    for c, (content, status) in zip(calls, results)
                 ],
             },
         ]
+    else:
+        log.warning("chat stopped after %d tool iterations", MAX_TOOL_ITERATIONS)
 
-        assistant = await anthropic_async.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=1000,
-            messages=messages,
-        )
-
+    _finish_usage(usage, "chat")
+    conversations.save(conversation_id, messages, selected)
     final_text = "".join(p.text for p in assistant.content if p.type == "text")
-    return {"response": final_text, "tools_used": tools_used}
+    return {"response": final_text, "tools_used": tools_used, "usage": usage,
+            "conversation_id": conversation_id}
 
 # ─────────────────── SSE helpers ───────────────────
 
@@ -340,194 +620,136 @@ async def chat_stream(req: ChatRequest):
         raise HTTPException(503, "MCP not ready")
 
     async def event_generator():
+        inflight: List[asyncio.Task] = []  # tool calls started from the stream
         try:
-            # Build tool list with detailed schemas
-            tools_json: List[Dict[str, Any]] = []
-            tool_schemas = {}  # Store schemas for validation later
-            
-            for tool in await client_mgr.list_tools():
-                schema = {"type": "object", "properties": {}, "required": []}
-                for arg in getattr(tool, "arguments", []):
-                    jtype = _py_to_json_type(getattr(arg, "type_", str) or str)
-                    schema["properties"][arg.name] = {
-                        "type": jtype,
-                        "description": getattr(arg, "description", "") or "",
-                    }
-                    if getattr(arg, "required", True) is not False:
-                        schema["required"].append(arg.name)
-                
-                tools_json.append(
-                    {
-                        "name": tool.name,
-                        "description": getattr(tool, "description", "") or "",
-                        "input_schema": schema,
-                    }
-                )
-                tool_schemas[tool.name] = schema  # Save for later validation
+            # Stored (or client-sent) history + the new user message
+            conversation_id, messages = _open_conversation(req)
 
-            # Build initial message list (history + new user msg)
-            messages: List[Dict[str, Any]] = [
-                {"role": msg["role"], "content": msg["content"]}
-                for msg in req.history
-            ] if req.history else []
-            messages.append({"role": "user", "content": req.message})
+            # Anthropic-style tool list: the catalog subset relevant to this chat
+            tools_json, selected = await _select_tools(conversation_id, messages)
 
             tools_used: List[str] = []
             current_text = ""
+            usage: Dict[str, int] = {}
 
             # Notify client that streaming starts
-            yield await _format_sse("start", {"status": "started"})
-
-            # Open Claude stream without stream_events parameter
-            async with anthropic_async.messages.stream(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1000,
-                messages=messages,
-                system=SYSTEM_PROMPT,
-                tools=tools_json
-            ) as stream:
-                tool_use_detected = False
-                tool_use = None
-                
-                async for chunk in stream:
-                    # Handle text chunks
-                    if chunk.type == "text":
-                        current_text += chunk.text
-                        yield await _format_sse("text", {"text": chunk.text})
-                        await asyncio.sleep(0)
-                    
-                    # Handle content_block_delta chunks
-                    elif (
-                        chunk.type == "content_block_delta"
-                        and chunk.delta.type == "text"
-                    ):
-                        current_text += chunk.delta.text
-                        yield await _format_sse("text", {"text": chunk.delta.text})
-                        await asyncio.sleep(0)
-
-                    # Handle tool_use blocks
-                    elif (
-                        chunk.type == "content_block_start"
-                        and chunk.content_block.type == "tool_use"
-                    ):
-                        tool_use_detected = True
-                        tool_use = chunk.content_block
-                        tools_used.append(tool_use.name)
-
-                        # Validate required parameters
-                        schema = tool_schemas.get(tool_use.name, {})
-                        required_params = schema.get("required", [])
-                        missing_params = [p for p in required_params if p not in (tool_use.input or {})]
-                        
-                        # Inform client about tool start
-                        yield await _format_sse(
-                            "tool_start",
-                            {
-                                "name": tool_use.name,
-                                "input": tool_use.input,
-                                "status": "starting",
-                                "missing_params": missing_params,
-                            },
-                        )
-                        await asyncio.sleep(0)
-                        
-                        # Log missing parameters if any
-                        if missing_params:
-                            log.warning(
-                                "Tool %s called without required parameters: %s", 
-                                tool_use.name, missing_params
-                            )
-                        
-                        # Call the tool
-                        try:
-                            raw = await client_mgr.call_tool(
-                                tool_use.name, tool_use.input or {}
-                            )
-                            tool_status = "success"
-                        except Exception as exc:
-                            log.error("Error calling tool %s: %s", tool_use.name, exc)
-                            error_msg = str(exc)
-                            
-                            # Provide more helpful error messages for validation errors
-                            if "validation error" in error_msg.lower():
-                                raw = [{"type": "text", "text": f"Missing required information: {error_msg}"}]
-                            else:
-                                raw = [{"type": "text", "text": f"Error: {error_msg}"}]
-                            tool_status = "error"
-                        
-                        # Serialize result
-                        if isinstance(raw, list) and all(
-                            isinstance(x, dict) and "type" in x for x in raw
+            yield await _format_sse("start", {"status": "started",
+                                              "conversation_id": conversation_id})
+
+            # Agent loop: tools are dispatched as soon as their input JSON is
+            # complete (content_block_stop), so they run while Claude is still
+            # streaming later blocks; results are merged in order afterwards.
+            for turn in range(MAX_TOOL_ITERATIONS):
+                if turn:
+                    yield await _format_sse("text", {"text": "\n\nProcessing the tool result...\n\n"})
+
+                streaming: Dict[int, Dict[str, Any]] = {}  # block index → tool_use
+                calls: List[tuple[Dict[str, Any], asyncio.Task]] = []
+
+                async with anthropic_async.messages.stream(
+                    **_model_request(messages, tools_json)
+                ) as stream:
+                    async for chunk in stream:
+                        # Handle text chunks
+                        if chunk.type == "text":
+                            current_text += chunk.text
+                            yield await _format_sse("text", {"text": chunk.text})
+                            await asyncio.sleep(0)
+
+                        # Collect tool_use input as it streams in
+                        elif (
+                            chunk.type == "content_block_start"
+                            and chunk.content_block.type == "tool_use"
                         ):
-                            result_content = raw
-                        else:
-                            safe = _to_json_safe(raw)
-                            result_content = json.dumps(safe, ensure_ascii=False)
-                        
-                        # Send result to client
-                        yield await _format_sse(
-                            "tool_result",
-                            {
-                                "name": tool_use.name,
-                                "result": result_content,
-                                "status": tool_status,
-                            },
-                        )
-                        await asyncio.sleep(0)
-                
-                # If a tool was used, we need to continue the conversation with the tool result
-                if tool_use_detected and tool_use:
-                    # Add the tool use and result to the messages
-                    messages += [
-                        {
-                            "role": "assistant",
-                            "content": [
+                            streaming[chunk.index] = {
+                                "id": chunk.content_block.id,
+                                "name": chunk.content_block.name,
+                                "json": [],
+                            }
+                        elif (
+                            chunk.type == "content_block_delta"
+                            and chunk.delta.type == "input_json_delta"
+                            and chunk.index in streaming
+                        ):
+                            streaming[chunk.index]["json"].append(chunk.delta.partial_json)
+
+                        # Input complete – start the tool right away
+                        elif (
+                            chunk.type == "content_block_stop"
+                            and chunk.index in streaming
+                        ):
+                            block = streaming.pop(chunk.index)
+                            try:
+                                args = json.loads("".join(block["json"]) or "{}")
+                            except ValueError:
+                                log.warning("Tool %s sent malformed input JSON", block["name"])
+                                args = {}
+                            tools_used.append(block["name"])
+
+                            # Validate required parameters
+                            required_params = tool_defs.schema(block["name"]).get("required", [])
+                            missing_params = [p for p in required_params if p not in args]
+
+                            # Inform client about tool start
+                            yield await _format_sse(
+                                "tool_start",
                                 {
-                                    "type": "tool_use",
-                                    "id": tool_use.id,
-                                    "name": tool_use.name,
-                                    "input": tool_use.input or {}
-                                }
-                            ],
-                        },
+                                    "name": block["name"],
+                                    "input": args,
+                                    "status": "starting",
+                                    "missing_params": missing_params,
+                                },
+                            )
+                            await asyncio.sleep(0)
+
+                            # Log missing parameters if any
+                            if missing_params:
+                                log.warning(
+                                    "Tool %s called without required parameters: %s",
+                                    block["name"], missing_params
+                                )
+
+                            task = asyncio.create_task(_run_tool(block["name"], args))
+                            calls.append((block, task))
+                            inflight.append(task)
+
+                    final = await stream.get_final_message()
+                _record_usage(usage, final.usage)
+
+                if not calls:
+                    messages.append(_assistant_message(final.content))
+                    break
+
+                # Merge results into the next turn in the order the tools were emitted
+                results: List[Dict[str, Any]] = []
+                for block, task in calls:
+                    result_content, tool_status = await task
+                    yield await _format_sse(
+                        "tool_result",
                         {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "tool_result",
-                                    "tool_use_id": tool_use.id,
-                                    "content": result_content,
-                                }
-                            ],
+                            "name": block["name"],
+                            "result": result_content,
+                            "status": tool_status,
                         },
-                    ]
-                    
-                    # Continue the conversation with a new stream
-                    yield await _format_sse("text", {"text": "\n\nProcessing the tool result...\n\n"})
-                    
-                    # Start a new stream with the updated messages
-                    async with anthropic_async.messages.stream(
-                        model="claude-3-5-sonnet-20241022",
-                        max_tokens=1000,
-                        messages=messages,
-                    ) as continued_stream:
-                        async for cont_chunk in continued_stream:
-                            if cont_chunk.type == "text":
-                                current_text += cont_chunk.text
-                                yield await _format_sse("text", {"text": cont_chunk.text})
-                                await asyncio.sleep(0)
-                            elif (
-                                cont_chunk.type == "content_block_delta"
-                                and cont_chunk.delta.type == "text"
-                            ):
-                                current_text += cont_chunk.delta.text
-                                yield await _format_sse("text", {"text": cont_chunk.delta.text})
-                                await asyncio.sleep(0)
+                    )
+                    await asyncio.sleep(0)
+                    results.append(_tool_result_block(block["id"], result_content, tool_status))
+
+                messages += [
+                    _assistant_message(final.content),
+                    {"role": "user", "content": results},
+                ]
+            else:
+                log.warning("chat stream stopped after %d tool iterations", MAX_TOOL_ITERATIONS)
+
+            _finish_usage(usage, "chat/stream")
+            conversations.save(conversation_id, messages, selected)
 
             # Send final event
             yield await _format_sse(
                 "done",
-                {"response": current_text, "tools_used": tools_used, "status": "completed"},
+                {"response": current_text, "tools_used": tools_used, "usage": usage,
+                 "conversation_id": conversation_id, "status": "completed"},
             )
 
         except Exception as exc:
@@ -543,6 +765,11 @@ async def chat_stream(req: ChatRequest):
                     "status": "error",
                 },
             )
+        finally:
+            # Client went away or the stream failed – don't leave tools running
+            for task in inflight:
+                if not task.done():
+                    task.cancel()
 
     return StreamingResponse(
         event_generator(),
@@ -611,21 +838,17 @@ async def configure(req: ConfigureRequest):
             }
         }
         
-        # Close existing connections first
-        await client_mgr.close()
-        
         # Use the same initialization process as during startup
-        session_id = init_mcp(payload)
+        # (repos are cloned asynchronously, never blocking the loop)
+        session_id = await init_mcp_async(payload)
         
         # Reload the configuration from the newly written mcp.json
         with open("mcp.json", "r") as f:
             mcp_config = json.load(f)
         
-        # Update the client manager configuration
-        client_mgr._cfg = mcp_config.get("mcpServers", {})
-        
-        # Reinitialize with new config
-        await client_mgr.initialize()
+        # Boot the new servers next to the live ones, then switch over;
+        # the old client keeps serving until its in-flight calls drain
+        await client_mgr.swap(mcp_config.get("mcpServers", {}))
         
         # Update the config hash
         global LAST_CONFIG_HASH
@@ -692,21 +915,17 @@ async def save_user_config(config_text: str = Body(...)):
             }
         }
         
-        # Close existing connections first
-        await client_mgr.close()
-        
         # Use the same initialization process as during startup
-        session_id = init_mcp(payload)
+        # (repos are cloned asynchronously, never blocking the loop)
+        session_id = await init_mcp_async(payload)
         
         # Reload the configuration from the newly written mcp.json
         with open("mcp.json", "r") as f:
             mcp_config = json.load(f)
         
-        # Update the client manager configuration
-        client_mgr._cfg = mcp_config.get("mcpServers", {})
-        
-        # Reinitialize with new config
-        await client_mgr.initialize()
+        # Boot the new servers next to the live ones, then switch over;
+        # the old client keeps serving until its in-flight calls drain
+        await client_mgr.swap(mcp_config.get("mcpServers", {}))
         
         # Update the config hash
         global LAST_CONFIG_HASH
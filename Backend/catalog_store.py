@@ -0,0 +1,73 @@
+"""
+On-disk snapshot of the MCP tool catalog.
+
+Each server's tools/list result is stored under the server name together with
+a hash of its normalised config, so an entry is only reused while the server
+is configured exactly the same way.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from mcp.types import Tool
+
+log = logging.getLogger(__name__)
+
+
+def config_hash(conf: Dict[str, Any]) -> str:
+    """Stable hash of one server's normalised config."""
+    blob = json.dumps(conf, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class CatalogStore:
+    """Tool lists persisted as {server: {"hash": …, "tools": [...]}} JSON."""
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = Path(path)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def load(self) -> None:
+        try:
+            self._entries = json.loads(self.path.read_text()).get("servers", {})
+        except FileNotFoundError:
+            self._entries = {}
+        except (OSError, ValueError) as exc:
+            log.warning("ignoring unreadable catalog snapshot %s – %s", self.path, exc)
+            self._entries = {}
+
+    def get(self, name: str, conf: Dict[str, Any]) -> Optional[List[Tool]]:
+        """Stored tools for `name`, or None if missing or its config changed."""
+        entry = self._entries.get(name)
+        if not entry or entry.get("hash") != config_hash(conf):
+            return None
+        try:
+            return [Tool.model_validate(t) for t in entry.get("tools", [])]
+        except ValueError as exc:
+            log.warning("ignoring catalog snapshot entry '%s' – %s", name, exc)
+            return None
+
+    def put(self, name: str, conf: Dict[str, Any], tools: List[Tool]) -> None:
+        entry = {
+            "hash": config_hash(conf),
+            "tools": [t.model_dump(mode="json", exclude_none=True) for t in tools],
+        }
+        if self._entries.get(name) == entry:
+            return
+        self._entries[name] = entry
+        self._write()
+
+    def _write(self) -> None:
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            tmp.write_text(json.dumps({"servers": self._entries}, indent=2))
+            os.replace(tmp, self.path)
+        except OSError as exc:
+            log.warning("could not write catalog snapshot %s – %s", self.path, exc)
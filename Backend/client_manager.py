@@ -2,18 +2,28 @@
 Compatibility wrapper so old imports (`from client_manager ...`) keep working
 """
 
+import asyncio
 import logging
 from typing import Any, Dict, List, Optional
 
 from mcp_client import MCPMultiClient
+from result_cache import ResultCache
 
 log = logging.getLogger(__name__)
 
+DRAIN_GRACE = 30  # seconds a replaced client may keep serving in-flight calls
+
 
 class MCPClientManager:
-    def __init__(self, cfg: Optional[Dict[str, Dict[str, Any]]] = None):
+    def __init__(self, cfg: Optional[Dict[str, Dict[str, Any]]] = None,
+                 result_cache: Optional[ResultCache] = None, **client_opts: Any):
         self._cfg: Dict[str, Dict[str, Any]] = cfg or {}
+        self._client_opts = client_opts     # forwarded to every MCPMultiClient
+        self._cache = result_cache          # None → every call goes to the server
         self._core: Optional[MCPMultiClient] = None
+        # old clients draining after a swap (retire task → client)
+        self._retiring: Dict[asyncio.Task, MCPMultiClient] = {}
+        self._swap_lock = asyncio.Lock()           # one reconcile/swap at a time
         self.initialized = False
 
     # ───────── public API ─────────
@@ -22,7 +32,7 @@ class MCPClientManager:
             return True
 
         # instantiate the new client
-        self._core = MCPMultiClient(self._cfg)
+        self._core = MCPMultiClient(self._cfg, **self._client_opts)
 
         # call the new coroutine (not the legacy shim)
         await self._core.initialize()          #  ← changed from .start()
@@ -30,31 +40,121 @@ class MCPClientManager:
         self.initialized = True
         return True
 
+    async def reconcile(self, cfg: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+        """Apply a new server map, restarting only what actually changed."""
+        if not self.initialized:
+            self._cfg = cfg
+            await self.initialize()
+            return {"added": list(cfg), "removed": [], "changed": [], "unchanged": []}
+        async with self._swap_lock:
+            actions = await self._core.reconcile(cfg)
+            self._cfg = cfg
+        if self._cache is not None:
+            for name in actions["changed"] + actions["removed"]:
+                self._cache.invalidate(name)
+        return actions
+
+    async def swap(self, cfg: Dict[str, Dict[str, Any]], grace: float = DRAIN_GRACE):
+        """
+        Blue/green reconfigure: boot a fresh client for `cfg` while the current
+        one keeps serving, switch over atomically, then retire the old client
+        once its in-flight calls drain (or `grace` seconds pass).
+        """
+        async with self._swap_lock:
+            fresh = MCPMultiClient(cfg, **self._client_opts)
+            await fresh.initialize()
+            await fresh.wait_ready()
+
+            old, self._core, self._cfg = self._core, fresh, cfg
+            self.initialized = True
+            if self._cache is not None:
+                self._cache.invalidate()
+
+        if old is not None:
+            task = asyncio.create_task(self._retire(old, grace))
+            self._retiring[task] = old
+            task.add_done_callback(lambda t: self._retiring.pop(t, None))
+        return True
+
+    async def _retire(self, old: MCPMultiClient, grace: float) -> None:
+        if not await old.drain(grace):
+            log.warning("Retiring MCP client with %d call(s) still in flight", old._inflight)
+        try:
+            await old.close()
+        except Exception as e:
+            log.error(f"Error closing retired MCP client: {e}")
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every server has finished booting (ready or failed)."""
+        if not self.initialized:
+            return False
+        return await self._core.wait_ready(timeout)
+
     async def list_tools(self):
         if not self.initialized:
             raise RuntimeError("MCP client not initialized")
         return await self._core.list_tools()
     
+    @property
+    def catalog_version(self) -> int:
+        """Version of the aggregated tool catalog; changes whenever it does."""
+        return self._core.catalog_version if self._core else 0
+
     async def list_mcps(self) -> List[str]:
         """Return a list of all connected MCP server names."""
         if not self.initialized:
             raise RuntimeError("MCP client not initialized")
         return list(self._cfg.keys())
 
+    def server_status(self) -> Dict[str, Dict[str, Any]]:
+        """Readiness of each configured server."""
+        if not self.initialized:
+            return {}
+        return self._core.status()
+
+    def tool_collisions(self) -> Dict[str, List[str]]:
+        """Return tool names exposed by more than one server."""
+        if not self.initialized:
+            return {}
+        return dict(self._core.collisions)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Result-cache counters (empty when caching is off)."""
+        return self._cache.stats() if self._cache is not None else {}
+
     async def call_tool(self, name: str, args: Dict[str, Any]):
         if not self.initialized:
             raise RuntimeError("MCP client not initialized")
-        return await self._core.call_tool(name, args)
+        core = self._core
+        server = core.route(name)
+        if self._cache is None or server is None:
+            return await core.call_tool(name, args)
+
+        ttl, max_entries = self._cache.policy(name, server, core.tool(name))
+        if ttl <= 0:
+            return await core.call_tool(name, args)
+
+        key = self._cache.key(server, name, args)
+        hit, content = self._cache.lookup(key)
+        if hit:
+            return content
+        result = await core.call_tool_result(name, args)
+        if not result.isError:               # never replay a failure
+            self._cache.put(key, server, name, result.content, ttl, max_entries)
+        return result.content
 
     async def close(self):
         """Close all connections and clean up resources."""
+        # Old clients still draining are closed now, not just abandoned
+        retiring = list(self._retiring.items())
+        for task, _ in retiring:
+            task.cancel()
+        await asyncio.gather(*(task for task, _ in retiring), return_exceptions=True)
+        await asyncio.gather(*(old.close() for _, old in retiring), return_exceptions=True)
         if self.initialized and self._core:
             try:
-                # Close all connections in the core client
-                for ctx in self._core._ctxs:
-                    await ctx.exit()
-                self._core._ctxs = []
-                self._core._sessions = {}
+                # Close all connections (and the tool routing index) in the core client
+                await self._core.close()
                 self.initialized = False
                 return True
             except Exception as e:
@@ -0,0 +1,96 @@
+"""
+Token-budgeted history compaction, applied right before each model call.
+
+Older exchanges are made cheaper in two steps, while the latest exchange
+(the newest user message and every tool round that followed it) is always
+sent untouched:
+
+1. large tool_result payloads are cut down to a head and a tail excerpt
+   with a marker saying how much was left out;
+2. if the history is still over budget, the oldest whole exchanges are
+   dropped, so every remaining tool_result keeps its tool_use.
+
+Tokens are estimated locally from the JSON size – no API round trip.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+from typing import Any, Dict, List
+
+from conversation_store import is_turn_start
+
+log = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN       = 4      # rough average for English text and JSON
+HISTORY_TOKEN_BUDGET  = 60_000 # estimated tokens of history sent per call
+TOOL_RESULT_MAX_CHARS = 4_000  # older tool_result text longer than this is excerpted
+
+
+def estimate_tokens(obj: Any) -> int:
+    return math.ceil(len(json.dumps(obj, ensure_ascii=False, separators=(",", ":")))
+                     / CHARS_PER_TOKEN)
+
+
+def excerpt(text: str, max_chars: int = TOOL_RESULT_MAX_CHARS) -> str:
+    """Head and tail of `text` (2/3 : 1/3) with a marker in between."""
+    if len(text) <= max_chars:
+        return text
+    head, tail = max_chars * 2 // 3, max_chars // 3
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n[… {omitted} characters of tool output omitted …]\n{text[-tail:]}"
+
+
+def _shrink_tool_results(message: Dict[str, Any], max_chars: int) -> Dict[str, Any]:
+    """Copy of `message` with oversized tool_result text excerpted."""
+    content = message.get("content")
+    if not isinstance(content, list):
+        return message
+    blocks = []
+    for block in content:
+        if isinstance(block, dict) and block.get("type") == "tool_result":
+            inner = block.get("content")
+            if isinstance(inner, str):
+                block = {**block, "content": excerpt(inner, max_chars)}
+            elif isinstance(inner, list):
+                block = {**block, "content": [
+                    {**b, "text": excerpt(b["text"], max_chars)}
+                    if isinstance(b, dict) and b.get("type") == "text" and "text" in b else b
+                    for b in inner
+                ]}
+        blocks.append(block)
+    return {**message, "content": blocks}
+
+
+def compact(messages: List[Dict[str, Any]],
+            budget: int = HISTORY_TOKEN_BUDGET,
+            max_tool_chars: int = TOOL_RESULT_MAX_CHARS) -> List[Dict[str, Any]]:
+    """
+    Messages to send for this call: older tool results excerpted, then the
+    oldest exchanges dropped until the estimate fits `budget`. The latest
+    exchange is never modified (it may exceed the budget on its own).
+    Returns a new list; `messages` is not mutated.
+    """
+    starts = [i for i, m in enumerate(messages) if is_turn_start(m)]
+    if not starts:
+        return messages
+    latest = starts[-1]
+    older = [_shrink_tool_results(m, max_tool_chars) for m in messages[:latest]]
+    recent = messages[latest:]
+
+    # exchange boundaries within `older`; anything before the first turn
+    # start belongs to the first exchange
+    bounds = [0, *(i for i in starts[:-1] if i)] + [latest]
+    sizes = [estimate_tokens(older[a:b]) for a, b in zip(bounds, bounds[1:])]
+    total = sum(sizes) + estimate_tokens(recent)
+
+    dropped = 0
+    while dropped < len(sizes) and total > budget:
+        total -= sizes[dropped]
+        dropped += 1
+    if dropped:
+        log.info("compaction: dropped %d oldest exchange(s), ~%d tokens remain",
+                 dropped, total)
+    return older[bounds[dropped]:] + recent
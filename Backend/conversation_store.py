@@ -0,0 +1,168 @@
+"""
+Server-side chat history, keyed by conversation id.
+
+Clients send only the new message plus a conversation id; the full message
+list – including tool_use / tool_result turns exactly as they were sent to
+the model – lives here, together with the conversation's tool selection
+(kept stable so the prompt-cache prefix is too). Conversations are held in
+an in-memory LRU and, when a path is given, mirrored to a SQLite file so
+they survive restarts.
+
+Memory stays bounded: the LRU holds at most `max_conversations`, each one is
+trimmed to `max_messages` / `max_bytes` (oldest whole turns first), and
+conversations idle for longer than `idle_expiry` are forgotten.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+MAX_CONVERSATIONS = 1000        # kept in memory (LRU)
+MAX_MESSAGES      = 200         # per conversation
+MAX_BYTES         = 1_000_000   # per conversation, as JSON
+IDLE_EXPIRY       = 24 * 3600   # seconds without activity before a conversation is dropped
+PURGE_INTERVAL    = 300         # seconds between expiry sweeps of the SQLite file
+
+_Entry = Tuple[float, List[Dict[str, Any]], List[str]]   # (last used, messages, tools)
+
+
+def is_turn_start(message: Dict[str, Any]) -> bool:
+    """
+    True for a user message that opens a new exchange – i.e. not one that
+    only carries tool_results for the preceding assistant tool_use.
+    """
+    if message.get("role") != "user":
+        return False
+    content = message.get("content")
+    return not (isinstance(content, list) and any(
+        isinstance(b, dict) and b.get("type") == "tool_result" for b in content))
+
+
+def _size(messages: List[Dict[str, Any]]) -> int:
+    return len(json.dumps(messages, ensure_ascii=False, separators=(",", ":")))
+
+
+class ConversationStore:
+    """LRU of conversations with optional SQLite persistence."""
+
+    def __init__(self, path: str | os.PathLike | None = None,
+                 max_conversations: int = MAX_CONVERSATIONS,
+                 max_messages: int = MAX_MESSAGES,
+                 max_bytes: int = MAX_BYTES,
+                 idle_expiry: float = IDLE_EXPIRY):
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.idle_expiry = idle_expiry
+        # id → (last used as wall-clock time, messages, tool names); LRU first
+        self._memory: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._last_purge = 0.0
+        if path:
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                " id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated REAL NOT NULL,"
+                " tools TEXT NOT NULL DEFAULT '[]')"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS conversations_updated ON conversations(updated)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def _entry(self, conversation_id: str) -> Optional[Tuple[List[Dict[str, Any]], List[str]]]:
+        """(messages, tool names) of a live conversation, or None."""
+        now = time.time()
+        entry = self._memory.get(conversation_id)
+        if entry is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT updated, messages, tools FROM conversations WHERE id = ?",
+                (conversation_id,),
+            ).fetchone()
+            if row is not None:
+                entry = (row[0], json.loads(row[1]), json.loads(row[2]))
+        if entry is None or now - entry[0] > self.idle_expiry:
+            return None
+        self._remember(conversation_id, now, entry[1], entry[2])
+        return entry[1], entry[2]
+
+    def load(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """Stored messages of a conversation ([] if unknown or expired)."""
+        entry = self._entry(conversation_id)
+        return list(entry[0]) if entry else []
+
+    def tool_names(self, conversation_id: str) -> List[str]:
+        """Tools offered to the model so far in a conversation ([] if none)."""
+        entry = self._entry(conversation_id)
+        return list(entry[1]) if entry else []
+
+    def save(self, conversation_id: str, messages: List[Dict[str, Any]],
+             tools: Optional[List[str]] = None) -> None:
+        """Store the full message list (trimmed to the size limits) and tools."""
+        now = time.time()
+        messages = self._trim(messages)
+        tools = list(tools or [])
+        self._remember(conversation_id, now, messages, tools)
+        if self._db is not None:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO conversations (id, messages, updated, tools)"
+                    " VALUES (?, ?, ?, ?)",
+                    (conversation_id, json.dumps(messages, ensure_ascii=False), now,
+                     json.dumps(tools)),
+                )
+                if now - self._last_purge > PURGE_INTERVAL:
+                    self._db.execute("DELETE FROM conversations WHERE updated < ?",
+                                     (now - self.idle_expiry,))
+                    self._last_purge = now
+                self._db.commit()
+            except sqlite3.Error as exc:
+                log.warning("could not persist conversation %s – %s", conversation_id, exc)
+
+    def _remember(self, conversation_id: str, now: float,
+                  messages: List[Dict[str, Any]], tools: List[str]) -> None:
+        self._memory[conversation_id] = (now, messages, tools)
+        self._memory.move_to_end(conversation_id)
+        while len(self._memory) > self.max_conversations:
+            self._memory.popitem(last=False)
+        # expire from the cold end
+        while self._memory:
+            oldest, (used, *_) = next(iter(self._memory.items()))
+            if now - used <= self.idle_expiry:
+                break
+            del self._memory[oldest]
+
+    def _trim(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Drop the oldest whole exchanges until the limits hold. The result
+        always starts at a turn start, so no tool_result loses its tool_use;
+        the latest exchange is kept even if it alone exceeds the limits.
+        """
+        starts = [i for i, m in enumerate(messages) if is_turn_start(m)]
+        for start in [0, *starts]:
+            kept = messages[start:]
+            if len(kept) <= self.max_messages and _size(kept) <= self.max_bytes:
+                return kept
+        return messages[starts[-1]:] if starts else messages
+
+    def stats(self) -> Dict[str, Any]:
+        return {"conversations_in_memory": len(self._memory),
+                "persistent": self._db is not None}
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
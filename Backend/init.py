@@ -9,33 +9,139 @@ mentioned in the handshake payload.
   runner:   python  <backend>/run_mcp.py  <script_path>
   so no external `uv` binary is required and every MCP server is
   started the same way.
+
+Repos are materialised with async, shallow git clones – all of them
+concurrently – into a cache keyed by URL and ref, so later handshakes
+reuse the checkout instead of cloning again and never block the loop.
+
+run_mcp.py launches get a prepared venv per dependency set (run_mcp's
+NEEDED_PKGS + the repo's requirements.txt / pyproject.toml dependencies),
+built once here and reused, so starting a Python server never runs pip.
+The venvs see the backend's site-packages, so anything a server needs but
+doesn't declare still resolves the way it did before.
+
+`npx <pkg> …` launches are pre-installed the same way: each distinct
+package spec once into its own folder under MCP_NPX_CACHE, and the
+launch rewritten to `node <bin>` so boots skip npm resolution entirely.
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import os
+import re
+import shutil
 import subprocess
 import sys
 import uuid
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urlparse
 
+try:
+    import tomllib                      # Python 3.11+
+except ImportError:                     # older interpreters: requirements.txt only
+    tomllib = None
+
+from run_mcp import ENV_STAMP, NEEDED_PKGS
+
 # Path to the generic launcher we ship with the backend
 GENERIC_RUNNER = Path(__file__).with_name("run_mcp.py").resolve()
 
+# One venv per dependency-set hash, shared by every launch of that set
+ENV_CACHE = Path(os.getenv("MCP_ENV_CACHE", "./mcp_envs")).expanduser().resolve()
+# One npm prefix per npx package spec (e.g. @smithery/cli@latest)
+NPX_CACHE = Path(os.getenv("MCP_NPX_CACHE", "./mcp_npx")).expanduser().resolve()
+NPX_STAMP = ".trialrun-npx"
+
+GIT_TIMEOUT = 180  # seconds per git command
+PIP_TIMEOUT = 600  # seconds to build one venv
+NPM_TIMEOUT = 300  # seconds to install one npx package
+_SHA_RE = re.compile(r"^[0-9a-f]{7,40}$")
+_SLOT_LOCKS: Dict[Path, asyncio.Lock] = {}  # one materialisation per cache slot
+
 
 # ────────────────────────── helpers ──────────────────────────
 def _repo_name(url: str) -> str:
     return os.path.splitext(os.path.basename(urlparse(url).path))[0]
 
 
-def _clone_if_needed(url: str, base: Path) -> Path:
-    dst = base / _repo_name(url)
-    if not dst.exists():
-        print(f"⇢ cloning {url} → {dst}")
-        subprocess.run(["git", "clone", url, str(dst)], check=True)
-    return dst.resolve()
+def _repo_ref(conf: dict) -> Tuple[str, Optional[str]]:
+    """(clone URL, optional branch/tag/commit) from `github` [+ `ref` or #fragment]."""
+    url, _, fragment = conf["github"].partition("#")
+    return url, conf.get("ref") or fragment or None
+
+
+def _repo_dir(url: str, ref: Optional[str], base: Path) -> Path:
+    """Cache slot for one (URL, ref) pair."""
+    key = hashlib.sha1(url.encode()).hexdigest()[:8]
+    return (base / f"{_repo_name(url)}-{key}{'@' + ref if ref else ''}").resolve()
+
+
+async def _exec(*cmd: str, cwd: Optional[Path] = None, timeout: float = GIT_TIMEOUT) -> str:
+    """Run a subprocess without blocking the event loop; return its stdout."""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, cwd=cwd,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+    )
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, list(cmd),
+                                            out, err.decode(errors="replace"))
+    return out.decode().strip()
+
+
+async def _git(*args: str, cwd: Optional[Path] = None) -> str:
+    return await _exec("git", *args, cwd=cwd)
+
+
+async def _materialise_repo(url: str, ref: Optional[str], base: Path) -> Path:
+    """Shallow-clone `url` at `ref` once; later calls reuse the cached checkout."""
+    dst = _repo_dir(url, ref, base)
+    async with _SLOT_LOCKS.setdefault(dst, asyncio.Lock()):
+        return await _materialise_slot(url, ref, dst)
+
+
+async def _materialise_slot(url: str, ref: Optional[str], dst: Path) -> Path:
+    if dst.exists():
+        if ref and _SHA_RE.match(ref):
+            head = await _git("rev-parse", "HEAD", cwd=dst)
+            if not head.startswith(ref):                  # pinned commit moved
+                await _git("fetch", "--depth", "1", "origin", ref, cwd=dst)
+                await _git("checkout", "--detach", "FETCH_HEAD", cwd=dst)
+        return dst
+
+    # clone next to the final slot and rename, so a failed clone never
+    # leaves a half-populated cache entry behind
+    tmp = dst.with_name(dst.name + ".partial")
+    shutil.rmtree(tmp, ignore_errors=True)
+    print(f"⇢ cloning {url}{'@' + ref if ref else ''} → {dst}")
+    if ref and _SHA_RE.match(ref):
+        tmp.mkdir(parents=True)
+        await _git("init", "-q", cwd=tmp)
+        await _git("remote", "add", "origin", url, cwd=tmp)
+        await _git("fetch", "--depth", "1", "origin", ref, cwd=tmp)
+        await _git("checkout", "-q", "--detach", "FETCH_HEAD", cwd=tmp)
+    else:
+        await _git("clone", "-q", "--depth", "1",
+                   *(["--branch", ref] if ref else []), url, str(tmp))
+    os.replace(tmp, dst)
+    return dst
+
+
+async def materialise_repos(confs: Iterable[dict], base: Path) -> Dict[Tuple[str, Optional[str]], Path]:
+    """Fetch every distinct repo referenced by `confs` concurrently."""
+    wanted = {_repo_ref(c) for c in confs if "github" in c}
+    paths = await asyncio.gather(*(_materialise_repo(u, r, base) for u, r in wanted))
+    return dict(zip(wanted, paths))
 
 
 def _write_files(cfg: dict, envs: dict[str, str]) -> None:
@@ -47,20 +153,181 @@ def _write_files(cfg: dict, envs: dict[str, str]) -> None:
     print(f"✓ generated mcp.json and .env ({len(envs)} vars)")
 
 
+# ───────────────────── python environments ───────────────────
+def _runner_script(conf: dict) -> Optional[Path]:
+    """Target script when `conf` launches through run_mcp.py, else None."""
+    args = conf.get("args") or []
+    if len(args) >= 2 and Path(args[0]).name == GENERIC_RUNNER.name:
+        return Path(args[1])
+    return None
+
+
+def _dependency_set(script: Path, repo_path: Optional[Path]) -> List[str]:
+    """
+    NEEDED_PKGS plus whatever a requirements.txt or a pyproject.toml
+    ([project].dependencies, as uv projects declare them) next to the
+    script / at the repo root asks for.
+    """
+    deps = set(NEEDED_PKGS)
+    for folder in {script.parent, repo_path} - {None}:
+        req = folder / "requirements.txt"
+        if req.is_file():
+            for line in req.read_text().splitlines():
+                line = line.split("#", 1)[0].strip()
+                if line and not line.startswith("-"):   # skip pip options / -r includes
+                    deps.add(line)
+        pyproject = folder / "pyproject.toml"
+        if tomllib is not None and pyproject.is_file():
+            try:
+                project = tomllib.loads(pyproject.read_text()).get("project", {})
+            except (OSError, ValueError) as exc:       # TOMLDecodeError is a ValueError
+                print(f"⚠ ignoring unreadable {pyproject} ({exc})")
+                continue
+            deps.update(d.strip() for d in project.get("dependencies", []) if d.strip())
+    return sorted(deps)
+
+
+def _env_python(env_dir: Path) -> Path:
+    return env_dir / ("Scripts/python.exe" if os.name == "nt" else "bin/python")
+
+
+async def _ensure_env(deps: List[str]) -> Path:
+    """
+    Build (once) the venv for `deps` and return its interpreter. It is
+    layered over the backend's site-packages, so undeclared imports that
+    used to work under the backend's interpreter keep working.
+    """
+    # "system-site" keeps envs built before that flag existed from being reused
+    stamp = "\n".join([sys.version, "system-site", *deps])
+    key = hashlib.sha256(stamp.encode()).hexdigest()[:16]
+    env_dir = ENV_CACHE / key
+    async with _SLOT_LOCKS.setdefault(env_dir, asyncio.Lock()):
+        if not (env_dir / ENV_STAMP).exists():
+            shutil.rmtree(env_dir, ignore_errors=True)        # half-built leftovers
+            print(f"⇢ preparing python env {key} ({', '.join(deps)})")
+            await _exec(sys.executable, "-m", "venv", "--system-site-packages", str(env_dir),
+                        timeout=PIP_TIMEOUT)
+            await _exec(str(_env_python(env_dir)), "-m", "pip", "install", "-q", *deps,
+                        timeout=PIP_TIMEOUT)
+            (env_dir / ENV_STAMP).write_text("\n".join(deps) + "\n")
+    return _env_python(env_dir)
+
+
+async def _provision_envs(servers: Dict[str, dict], repo_base: Path) -> None:
+    """Point every run_mcp.py launch at the prepared venv for its dependency set."""
+    wanted: Dict[str, Tuple[str, ...]] = {}
+    for name, conf in servers.items():
+        script = _runner_script(conf)
+        if script is None:
+            continue
+        repo_path = _repo_dir(*_repo_ref(conf), repo_base) if "github" in conf else None
+        wanted[name] = tuple(_dependency_set(script, repo_path))
+
+    unique = list(set(wanted.values()))
+    built = await asyncio.gather(*(_ensure_env(list(d)) for d in unique),
+                                 return_exceptions=True)
+    pythons = dict(zip(unique, built))
+    for name, deps in wanted.items():
+        python = pythons[deps]
+        if isinstance(python, Exception):
+            print(f"⚠ python env for '{name}' not prepared ({python}) – "
+                  "run_mcp.py will install at launch")
+            continue
+        servers[name]["command"] = str(python)
+
+
+# ─────────────────────── npx packages ────────────────────────
+_NPX_FLAGS = {"-y", "--yes", "-q", "--quiet"}
+
+
+def _npx_spec(conf: dict) -> Optional[Tuple[str, List[str]]]:
+    """(package spec, remaining args) for a plain `npx [-y] <pkg> …` launch."""
+    if Path(conf.get("command") or "").stem != "npx":
+        return None
+    args = list(conf.get("args") or [])
+    while args and args[0] in _NPX_FLAGS:
+        args.pop(0)
+    if not args or args[0].startswith("-"):    # -p / -c / --package forms: leave alone
+        return None
+    return args[0], args[1:]
+
+
+def _npm_name(spec: str) -> str:
+    """Package name without its version: '@smithery/cli@latest' → '@smithery/cli'."""
+    at = spec.find("@", 1)
+    return spec if at == -1 else spec[:at]
+
+
+def _npx_bin(prefix: Path, name: str) -> Path:
+    """Entry script of the package's (default) bin, as npx would pick it."""
+    pkg_dir = prefix / "node_modules" / name
+    bins = json.loads((pkg_dir / "package.json").read_text()).get("bin")
+    if isinstance(bins, str):
+        return pkg_dir / bins
+    bins = bins or {}
+    short = name.rsplit("/", 1)[-1]
+    if short in bins:
+        return pkg_dir / bins[short]
+    if len(bins) == 1:
+        return pkg_dir / next(iter(bins.values()))
+    raise RuntimeError(f"cannot tell which bin of {name} to run: {sorted(bins)}")
+
+
+async def _ensure_npx(spec: str, npm: str) -> Path:
+    """Install `spec` (once) into its own prefix and return its bin script."""
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", spec.lstrip("@"))
+    prefix = NPX_CACHE / f"{slug}-{hashlib.sha1(spec.encode()).hexdigest()[:8]}"
+    async with _SLOT_LOCKS.setdefault(prefix, asyncio.Lock()):
+        if not (prefix / NPX_STAMP).exists():
+            shutil.rmtree(prefix, ignore_errors=True)
+            prefix.mkdir(parents=True)
+            print(f"⇢ installing {spec} for npx launches")
+            await _exec(npm, "install", "--prefix", str(prefix), "--no-audit",
+                        "--no-fund", "--silent", spec, timeout=NPM_TIMEOUT)
+            (prefix / NPX_STAMP).write_text(spec + "\n")
+    return _npx_bin(prefix, _npm_name(spec))
+
+
+async def _provision_npx(servers: Dict[str, dict]) -> None:
+    """Rewrite `npx <pkg> …` launches to `node <installed bin> …`."""
+    wanted = {name: parsed for name, conf in servers.items()
+              if (parsed := _npx_spec(conf))}
+    if not wanted:
+        return
+    npm, node = shutil.which("npm"), shutil.which("node")
+    if not (npm and node):
+        print("⚠ npm/node not on PATH – npx servers will resolve at launch")
+        return
+
+    specs = list({spec for spec, _ in wanted.values()})
+    built = await asyncio.gather(*(_ensure_npx(s, npm) for s in specs),
+                                 return_exceptions=True)
+    scripts = dict(zip(specs, built))
+    for name, (spec, rest) in wanted.items():
+        script = scripts[spec]
+        if isinstance(script, Exception):
+            print(f"⚠ {spec} for '{name}' not pre-installed ({script}) – "
+                  "npx will resolve at launch")
+            continue
+        servers[name]["command"] = node
+        servers[name]["args"] = [str(script), *rest]
+
+
 # ────────────────────── normalise one server ─────────────────
 def _normalise_server(name: str, conf: dict, repo_base: Path):
     """
-    • clones Git repo when present
+    • points at the cached checkout of the Git repo when present
+      (call `materialise_repos` first – this function never clones)
     • rewrites `uv …` commands to use our generic run_mcp.py wrapper
     • returns  (normalised_conf,   collected_env_vars)
     """
     env_out = conf.get("env", {}) or {}
     new_conf = conf.copy()
 
-    # ─ Optionally clone GitHub repo ─
+    # ─ GitHub repo checkout ─
     repo_path: Path | None = None
     if "github" in conf:
-        repo_path = _clone_if_needed(conf["github"], repo_base)
+        repo_path = _repo_dir(*_repo_ref(conf), repo_base)
 
     # ─ Always adapt `uv` commands ─
     if conf.get("command") == "uv":
@@ -82,8 +349,29 @@ def _normalise_server(name: str, conf: dict, repo_base: Path):
     return new_conf, env_out
 
 
+async def normalise_servers(servers: Dict[str, dict], repo_base: Path):
+    """
+    Materialise all repos concurrently, normalise every server, then
+    prepare the python envs / npx packages its launches need. Returns (normalised_servers, collected_env_vars).
+    """
+    repo_base.mkdir(parents=True, exist_ok=True)
+    await materialise_repos(servers.values(), repo_base)
+    out: Dict[str, dict] = {}
+    env_vars: Dict[str, str] = {}
+    for name, conf in servers.items():
+        out[name], env = _normalise_server(name, conf, repo_base)
+        env_vars.update(env)
+    await asyncio.gather(_provision_envs(out, repo_base), _provision_npx(out))
+    return out, env_vars
+
+
 # ─────────────────────────── main API ────────────────────────
 def init_mcp(payload, sandbox_base: str = "./mcp_sandboxes", session_id: str = None):
+    """Blocking wrapper around `init_mcp_async` (CLI / sync callers)."""
+    return asyncio.run(init_mcp_async(payload, sandbox_base, session_id))
+
+
+async def init_mcp_async(payload, sandbox_base: str = "./mcp_sandboxes", session_id: str = None):
     """
     Accepts either:
     • NEW style  – single dict containing `settings.mcpServers`
@@ -106,7 +394,7 @@ def init_mcp(payload, sandbox_base: str = "./mcp_sandboxes", session_id: str = N
     # Store session_id in environment variables
     env_vars = {"SESSION_ID": session_id}
     
-    mcp_cfg: dict = {"mcpServers": {}}
+    raw: dict = {}
 
     # ─── new-style payload ───
     if isinstance(payload, dict) and "settings" in payload:
@@ -114,11 +402,7 @@ def init_mcp(payload, sandbox_base: str = "./mcp_sandboxes", session_id: str = N
         if "sandbox_id" in payload:
             payload["session_id"] = session_id
             
-        servers = payload["settings"].get("mcpServers", {})
-        for name, conf in servers.items():
-            norm, env = _normalise_server(name, conf, repo_base)
-            mcp_cfg["mcpServers"][name] = norm
-            env_vars.update(env)
+        raw = dict(payload["settings"].get("mcpServers", {}))
 
     # ─── old list-of-records ───
     elif isinstance(payload, (list, tuple)):
@@ -136,13 +420,15 @@ def init_mcp(payload, sandbox_base: str = "./mcp_sandboxes", session_id: str = N
             if rec.get("hosted") or rec.get("type") == "url":
                 conf = {"url": rec.get("mcp_url", "")}
 
-            norm, env = _normalise_server(name, conf, repo_base)
-            mcp_cfg["mcpServers"][name] = norm
-            env_vars.update(env)
+            raw[name] = conf
 
     else:
         raise ValueError("Unsupported payload type supplied to init_mcp()")
 
+    servers, env = await normalise_servers(raw, repo_base)
+    env_vars.update(env)
+    mcp_cfg: dict = {"mcpServers": servers}
+
     _write_files(mcp_cfg, env_vars)
     
     return session_id
@@ -3,107 +3,718 @@
 from __future__ import annotations
 
 import asyncio
+import itertools
+import json
 import logging
+import os
+import random
 import time
-from typing import Any, Dict, List
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Dict, List, Optional, Set, Tuple, TypeVar
 
+import anyio
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
-from mcp.types import Tool
+from mcp.types import (CallToolResult, ServerNotification, Tool,
+                       ToolListChangedNotification)
+
+from catalog_store import CatalogStore
 
 log = logging.getLogger(__name__)
 
 BOOT_TIMEOUT      = 60   # overall per server
-INIT_CALL_TIMEOUT = 10   # single initialize() attempt
+BACKOFF_BASE      = 0.25 # first retry delay (s); doubles per attempt …
+BACKOFF_MAX       = 8    # … up to this cap, with jitter
+MAX_INFLIGHT      = 8    # concurrent requests per server (pipelined on one session)
+
+PING_INTERVAL     = 15   # supervisor: seconds between health probes
+PING_TIMEOUT      = 5    # a probe slower than this counts as a failure
+PING_FAILURES     = 3    # consecutive failed probes before a restart
+RESTART_BASE      = 1    # first restart delay (s); doubles per crash …
+RESTART_MAX       = 60   # … up to this cap, with jitter
+RESTART_RESET     = 300  # healthy this long → crash backoff starts over
+BOOT_RESTARTS     = 3    # a server that has never been ready gets this many retries
+
+IDLE_TIMEOUT      = 600  # lazy mode: stop a server unused for this long (s)
+REAP_INTERVAL     = 15   # lazy mode: idle / memory check period (s)
+
+# Catalog versions are unique across client instances, so caches keyed on the
+# version stay valid when one MCPMultiClient replaces another.
+_catalog_versions = itertools.count(1)
+
+
+T = TypeVar("T")
+
+
+class _ServerExited(RuntimeError):
+    """The server's transport hit EOF (child process died / connection closed)."""
+
+
+def _conf_key(conf: Dict[str, Any]) -> str:
+    """Order-independent fingerprint of one server's config."""
+    return json.dumps(conf, sort_keys=True)
+
+
+def tool_call_key(name: str, args: Dict[str, Any]) -> str:
+    """Canonical identity of one call: tool name + key-sorted JSON arguments."""
+    return name + ":" + json.dumps(args or {}, sort_keys=True, separators=(",", ":"),
+                                   ensure_ascii=False, default=str)
+
+
+def mutates(tool: Optional[Tool]) -> bool:
+    """
+    True unless the tool is annotated read-only or idempotent. Per the MCP
+    spec an unannotated tool defaults to readOnlyHint=false, so it is
+    presumed to change state.
+    """
+    annotations = getattr(tool, "annotations", None)
+    return not (
+        getattr(annotations, "readOnlyHint", None) is True
+        or getattr(annotations, "idempotentHint", None) is True
+    )
+
+
+def _backoff(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """Exponential backoff with equal jitter: [d/2, d) where d = base·2^n."""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+async def _watch_eof(read, eof: asyncio.Event, stack: AsyncExitStack):
+    """
+    Relay `read` through a new stream and set `eof` once the transport ends,
+    so a crashed child is noticed immediately instead of via a timeout.
+    """
+    send, recv = anyio.create_memory_object_stream(0)
+
+    async def _pump() -> None:
+        try:
+            async with send:
+                async for item in read:
+                    await send.send(item)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            pass
+        finally:
+            eof.set()
+
+    pump = asyncio.create_task(_pump())
+
+    async def _stop() -> None:
+        pump.cancel()
+        await asyncio.gather(pump, return_exceptions=True)
+
+    stack.push_async_callback(_stop)
+    return recv
+
+
+async def _alive(srv: "_Server", call: Awaitable[T], deadline: float, what: str) -> T:
+    """Await an MCP request until `deadline`, failing fast on transport EOF."""
+    task = asyncio.ensure_future(call)
+    eof = asyncio.ensure_future(srv.eof.wait())
+    try:
+        done, _ = await asyncio.wait({task, eof}, return_when=asyncio.FIRST_COMPLETED,
+                                     timeout=max(0.0, deadline - time.monotonic()))
+    finally:
+        eof.cancel()
+        if not task.done():
+            task.cancel()
+    # EOF first: a pending request fails with "Connection closed" on EOF,
+    # which must not look like an ordinary (retryable) error
+    if eof in done or srv.eof.is_set():
+        raise _ServerExited(f"'{srv.name}' exited during {what}")
+    if task in done:
+        return task.result()
+    raise TimeoutError(f"{srv.name} {what} timed-out")
+
+
+def _descendants_rss_mb() -> Optional[float]:
+    """Resident memory (MiB) of every process below this one; None off Linux."""
+    try:
+        children: Dict[int, List[int]] = {}
+        for entry in os.scandir("/proc"):
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry.name}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry.name))
+
+        pages, todo = 0, list(children.get(os.getpid(), []))
+        while todo:
+            pid = todo.pop()
+            todo.extend(children.get(pid, []))
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    pages += int(f.read().split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return None
 
 
 # ────────────────────────────────────────────────────────────
-class _CtxHolder:
-    """Keeps any async-context-manager (transport or session) alive."""
-    def __init__(self, cm):  self.cm = cm; self.obj = None
-    async def enter(self):   self.obj = await self.cm.__aenter__(); return self.obj
-    async def exit(self):    await self.cm.__aexit__(None, None, None)
+class _Server:
+    """
+    Runtime state of one MCP server. Its transport and session live inside
+    `task`, so they are entered and exited by the same asyncio task.
+    """
+    def __init__(self, name: str, conf: Dict[str, Any], max_inflight: int):
+        self.name, self.conf = name, conf
+        self.session: Optional[ClientSession] = None
+        self.limit = asyncio.Semaphore(max_inflight)   # per-server in-flight cap
+        self.booted = asyncio.Event()                  # boot finished (ok or failed)
+        self.task: Optional[asyncio.Task] = None       # None while parked (lazy mode)
+        self.lifecycle = asyncio.Lock()                # serialises wake / park
+        self.parking = False
+        self.inflight = 0
+        self.last_used = time.monotonic()
+        self.state = "booting"                         # booting | ready | failed | restarting | idle
+        self.started_at = time.monotonic()
+        self.ready_after: Optional[float] = None       # seconds from launch to ready
+        self.error: Optional[str] = None
+        self.eof = asyncio.Event()                     # transport closed
+        self.timings: Dict[str, float] = {}            # boot phase → seconds since spawn
+        self.restarts = 0
+        self.next_restart_at: Optional[float] = None   # monotonic time of pending restart
+        self.last_failure: Optional[str] = None
+        self.probe_latency: Optional[float] = None     # last successful ping (s)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "time_to_ready": None if self.ready_after is None else round(self.ready_after, 3),
+            "boot_timings": self.timings,
+            "error": self.error,
+            "restarts": self.restarts,
+            "next_restart_in": None if self.next_restart_at is None
+                               else round(max(0.0, self.next_restart_at - time.monotonic()), 1),
+            "last_failure": self.last_failure,
+            "probe_latency_ms": None if self.probe_latency is None
+                                else round(self.probe_latency * 1000, 1),
+        }
+
+
+class _Flight:
+    """One tool call shared by every concurrent caller with the same key."""
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
 
 
 # ────────────────────────────────────────────────────────────
 class MCPMultiClient:
     """Aggregates multiple MCP servers behind a single interface."""
 
-    def __init__(self, mcp_servers: Dict[str, Dict[str, Any]]):
+    def __init__(self, mcp_servers: Dict[str, Dict[str, Any]],
+                 max_inflight: int = MAX_INFLIGHT,
+                 lazy: bool = False,
+                 idle_timeout: float = IDLE_TIMEOUT,
+                 max_rss_mb: Optional[float] = None,
+                 catalog_path: Optional[str] = None):
         self._cfg      = mcp_servers
-        self._sessions: Dict[str, ClientSession] = {}
-        self._ctxs: List[_CtxHolder] = []        # keeps transports + sessions open
-        self._lock = asyncio.Lock()
+        self._max_inflight = max(1, max_inflight)
+        # lazy mode: servers known from the persisted catalog start on first
+        # use and are stopped again when idle or when memory runs short
+        self._lazy = lazy
+        self._idle_timeout = idle_timeout
+        self._max_rss_mb = max_rss_mb
+        self._store = CatalogStore(catalog_path) if catalog_path else None
+        self._reaper: Optional[asyncio.Task] = None
+        self._servers: Dict[str, _Server] = {}
+        self._tools: Dict[str, List[Tool]] = {}  # server → cached tools/list result
+        self._stale: Set[str] = set()            # servers whose cached tools are outdated
+        self._from_snapshot: Set[str] = set()    # entries not yet confirmed by a live list
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.catalog_version = next(_catalog_versions)  # moves whenever any tool list changes
+        self._routes: Dict[str, str] = {}        # tool name → server name
+        self.collisions: Dict[str, List[str]] = {}  # tool name → servers exposing it
+        self._inflight = 0                       # tool calls currently running
+        self._flights: Dict[str, _Flight] = {}   # tool_call_key → shared in-flight call
+        self._drained = asyncio.Event()
+        self._drained.set()
         self.initialized = False
 
     async def start(self):                  # back-compat
         await self.initialize()
 
     async def initialize(self) -> None:
-        await asyncio.gather(*(self._connect(n, c) for n, c in self._cfg.items()))
+        """
+        Launch every server and return at once; each one joins routing and
+        the catalog as soon as it is ready (see `wait_ready` to block).
+        """
+        for name, conf in self._cfg.items():
+            self._add_server(name, conf)
+        if self._lazy and self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_loop(), name="mcp:reaper")
         self.initialized = True
 
-    async def _connect(self, name: str, conf: Dict[str, Any]) -> None:
-        async def _boot() -> None:
-            # 1) open transport -------------------------------------------------
-            if "command" in conf:
-                log.info("⏳  launching local '%s' → %s %s",
-                         name, conf['command'], conf.get('args'))
-                transport = _CtxHolder(stdio_client(StdioServerParameters(
-                    command=conf["command"], args=conf.get("args", []), env=conf.get("env"))))
-            elif "url" in conf:
-                log.info("⏳  connecting remote '%s' (%s)", name, conf["url"])
-                transport = _CtxHolder(sse_client(conf["url"]))
-            else:
-                raise RuntimeError(f"Server '{name}' has no command or url")
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every server has finished booting (ready or failed)."""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(s.booted.wait() for s in self._servers.values())),
+                timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    # ───────────── per-server lifecycle ─────────────
+    def _add_server(self, name: str, conf: Dict[str, Any]) -> None:
+        """
+        Register a server. A matching catalog snapshot is advertised at once
+        (calls wait for the boot); lazy mode parks such servers instead of
+        launching them.
+        """
+        srv = self._servers[name] = _Server(name, conf, self._max_inflight)
+        cached = self._store.get(name, conf) if self._store else None
+        if cached is not None:
+            self._set_tools(name, cached, persist=False)
+            self._from_snapshot.add(name)
+        if cached is not None and self._lazy:
+            srv.state = "idle"
+            srv.booted.set()
+            log.info("💤  '%s' parked (%d tools from catalog snapshot)", name, len(cached))
+            return
+        self._launch(srv)
+
+    def _launch(self, srv: _Server) -> None:
+        srv.state, srv.started_at = "booting", time.monotonic()
+        srv.booted = asyncio.Event()
+        srv.task = asyncio.create_task(self._run(srv), name=f"mcp:{srv.name}")
+
+    async def _stop_server(self, name: str) -> None:
+        srv = self._servers.pop(name, None)
+        if srv is None:
+            return
+        if srv.task is None:            # parked: no task to clear its catalog entry
+            self._drop_tools(name)
+            return
+        srv.task.cancel()
+        await asyncio.gather(srv.task, return_exceptions=True)
+
+    async def _wake(self, srv: _Server) -> None:
+        """Start a parked server (if needed) and wait for its boot to finish."""
+        if srv.session is None:
+            async with srv.lifecycle:
+                if srv.task is None:
+                    log.info("⏰  waking '%s' on demand", srv.name)
+                    self._launch(srv)
+            await srv.booted.wait()
+            if self._max_rss_mb:
+                await self._enforce_memory(keep=srv.name)
 
-            read, write = await transport.enter()
-            self._ctxs.append(transport)
+    async def _park(self, srv: _Server, why: str) -> bool:
+        """Stop an idle server but keep advertising its catalog entry."""
+        async with srv.lifecycle:
+            if srv.task is None or srv.inflight:
+                return False
+            srv.parking, srv.session = True, None    # no new calls routed to it
+            task, srv.task = srv.task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            srv.parking, srv.state = False, "idle"
+            srv.booted.set()
+        log.info("💤  '%s' stopped (%s)", srv.name, why)
+        return True
 
-            # 2) open ClientSession as context manager -------------------------
-            session_holder = _CtxHolder(ClientSession(read, write))
-            session = await session_holder.enter()
-            self._ctxs.append(session_holder)
+    async def _reap_loop(self) -> None:
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            try:
+                now = time.monotonic()
+                for srv in list(self._servers.values()):
+                    if (srv.task is not None and not srv.inflight
+                            and now - srv.last_used >= self._idle_timeout
+                            and self._cached(srv.name)):
+                        await self._park(srv, f"idle {now - srv.last_used:.0f}s")
+                if self._max_rss_mb:
+                    await self._enforce_memory()
+            except Exception as exc:
+                log.error("idle reaper: %s", exc)
 
-            # 3) warm-up loop ---------------------------------------------------
-            start = time.monotonic()
-            while int(time.monotonic() - start) < BOOT_TIMEOUT:
+    async def _enforce_memory(self, keep: Optional[str] = None) -> None:
+        """Evict least-recently-used idle servers while over the memory ceiling."""
+        while True:
+            rss = await asyncio.to_thread(_descendants_rss_mb)
+            if rss is None or rss <= self._max_rss_mb:
+                return
+            victims = sorted((s for s in self._servers.values()
+                              if s.task is not None and not s.inflight
+                              and s.name != keep and self._cached(s.name)),
+                             key=lambda s: s.last_used)
+            if not victims or not await self._park(victims[0], f"memory {rss:.0f} MiB"
+                                                   f" > {self._max_rss_mb:.0f} MiB"):
+                return
+
+    def _cached(self, name: str) -> bool:
+        """True if `name` can be parked without losing its tool metadata."""
+        return name in self._tools and name not in self._stale
+
+    async def _run(self, srv: _Server) -> None:
+        """
+        Supervise one server until cancelled: boot it, serve while it passes
+        health probes, and on a crash or hang take it out of routing and
+        restart it with backoff. A server that has never been ready stays
+        `failed` while it is retried, and is given up on after BOOT_RESTARTS.
+        """
+        name = srv.name
+        crashes = 0                                 # consecutive, for backoff
+        while True:
+            stack: Optional[AsyncExitStack] = None
+            healthy_since: Optional[float] = None
+            try:
+                stack, session = await self._open(srv)
+                srv.session = session
+                srv.state, srv.error = "ready", None
+                srv.ready_after = time.monotonic() - srv.started_at
+                srv.booted.set()
+                log.info("🟢  '%s' serving after %.1fs %s", name, srv.ready_after, srv.timings)
+                healthy_since = time.monotonic()
+                reason = await self._supervise(srv, session)
+                raise _ServerExited(f"'{name}' {reason}")
+            except Exception as exc:
+                srv.state, srv.error = "failed", str(exc) or type(exc).__name__
+                srv.last_failure = srv.error
+                log.error("❌  %s: %s", name, exc)
+            finally:
+                srv.session = None
+                if srv.state == "ready":
+                    srv.state = "stopped"
+                srv.booted.set()
+                if stack is not None:
+                    await stack.aclose()
+                if self._servers.get(name) in (None, srv) and not srv.parking:
+                    self._drop_tools(name)   # out of routing unless merely parked
+
+            if healthy_since and time.monotonic() - healthy_since >= RESTART_RESET:
+                crashes = 0
+            if srv.ready_after is None and crashes >= BOOT_RESTARTS:
+                log.error("❌  '%s' never became ready – giving up after %d restarts",
+                          name, crashes)
+                return
+            delay = _backoff(crashes, RESTART_BASE, RESTART_MAX)
+            crashes += 1
+            srv.restarts += 1
+            if srv.ready_after is not None:         # was serving: it is coming back
+                srv.state = "restarting"
+            srv.next_restart_at = time.monotonic() + delay
+            log.warning("♻️  restarting '%s' in %.1fs (restart #%d)", name, delay, srv.restarts)
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                srv.next_restart_at = None
+            srv.started_at = time.monotonic()
+
+    async def _supervise(self, srv: _Server, session: ClientSession) -> str:
+        """Return once the server's transport closes or it stops answering pings."""
+        failures = 0
+        while True:
+            try:
+                await asyncio.wait_for(srv.eof.wait(), timeout=PING_INTERVAL)
+                return "transport closed"
+            except asyncio.TimeoutError:
+                pass
+
+            t0 = time.monotonic()
+            try:
+                await _alive(srv, session.send_ping(), t0 + PING_TIMEOUT, "ping")
+                srv.probe_latency, failures = time.monotonic() - t0, 0
+            except _ServerExited:
+                return "transport closed"
+            except Exception as exc:
+                failures += 1
+                log.warning("'%s' health probe failed (%d/%d) – %s",
+                            srv.name, failures, PING_FAILURES, str(exc) or type(exc).__name__)
+                if failures >= PING_FAILURES:
+                    return f"unresponsive after {failures} failed probes"
+
+    async def _open(self, srv: _Server) -> Tuple[AsyncExitStack, ClientSession]:
+        """
+        Boot attempts with a fast first try and jittered exponential backoff.
+        Each retry gets a fresh transport + session; a child that exits, or an
+        exhausted BOOT_TIMEOUT budget, fails straight away.
+        """
+        deadline = srv.started_at + BOOT_TIMEOUT
+        attempt = 0
+        while True:
+            stack = AsyncExitStack()
+            try:
+                return stack, await self._boot(srv, stack, deadline)
+            except BaseException as exc:
+                await stack.aclose()
+                if not isinstance(exc, Exception) or isinstance(exc, (_ServerExited, TimeoutError)):
+                    raise
+                if srv.eof.is_set():        # whatever failed, the child is gone
+                    raise _ServerExited(f"'{srv.name}' exited during boot – {exc}") from exc
+                delay = _backoff(attempt)
+                if time.monotonic() + delay >= deadline:
+                    raise
+                attempt += 1
+                log.warning("'%s' boot attempt %d failed – %s (retry in %.2fs)",
+                            srv.name, attempt, exc, delay)
+            await asyncio.sleep(delay)
+
+    async def _boot(self, srv: _Server, stack: AsyncExitStack,
+                    deadline: float) -> ClientSession:
+        name, conf = srv.name, srv.conf
+        t0 = time.monotonic()
+        srv.timings = {}
+        srv.eof = asyncio.Event()         # fresh per attempt: only this child's EOF counts
+
+        def _mark(phase: str) -> None:
+            srv.timings[phase] = round(time.monotonic() - t0, 3)
+
+        # 1) spawn / connect ----------------------------------------------------
+        if "command" in conf:
+            log.info("⏳  launching local '%s' → %s %s",
+                     name, conf['command'], conf.get('args'))
+            transport = stdio_client(StdioServerParameters(
+                command=conf["command"], args=conf.get("args", []), env=conf.get("env")))
+        elif "url" in conf:
+            log.info("⏳  connecting remote '%s' (%s)", name, conf["url"])
+            transport = sse_client(conf["url"])
+        else:
+            raise RuntimeError(f"Server '{name}' has no command or url")
+
+        read, write = await stack.enter_async_context(transport)
+        _mark("spawn")
+
+        # 2) open ClientSession on a read stream that reports EOF ---------------
+        read = await _watch_eof(read, srv.eof, stack)
+        session = await stack.enter_async_context(ClientSession(
+            read, write, message_handler=self._notification_handler(name)))
+        _mark("transport")
+
+        # 3) one initialize(), raced against the child going away ---------------
+        await _alive(srv, session.initialize(), deadline, "initialize")
+        _mark("initialize")
+
+        # 4) first listing goes straight into the catalog -----------------------
+        tools = (await _alive(srv, session.list_tools(), deadline, "tools/list")).tools
+        _mark("list_tools")
+        self._set_tools(name, tools)
+        log.info("🟢  '%s' ready (%d tool%s)",
+                 name, len(tools), "" if len(tools) == 1 else "s")
+        return session
+
+    async def reconcile(self, new_cfg: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+        """
+        Bring the running servers in line with `new_cfg`: only added, removed
+        or changed servers are started/stopped; untouched sessions stay warm.
+        """
+        t0 = time.monotonic()
+        old_cfg = self._cfg
+        actions: Dict[str, List[str]] = {
+            "added":     [n for n in new_cfg if n not in old_cfg],
+            "removed":   [n for n in old_cfg if n not in new_cfg],
+            "changed":   [n for n in new_cfg if n in old_cfg
+                          and _conf_key(new_cfg[n]) != _conf_key(old_cfg[n])],
+        }
+        actions["unchanged"] = [n for n in new_cfg if n in old_cfg
+                                and n not in actions["changed"]]
+
+        self._cfg = new_cfg
+        await asyncio.gather(*(self._stop_server(n)
+                               for n in actions["removed"] + actions["changed"]))
+        for n in actions["added"] + actions["changed"]:
+            self._add_server(n, new_cfg[n])
+        await asyncio.gather(*(self._servers[n].booted.wait()
+                               for n in actions["added"] + actions["changed"]))
+        self._rebuild_routes()
+
+        for kind in ("added", "removed", "changed"):
+            for n in actions[kind]:
+                log.info("🔧  reconcile: %s '%s'", kind, n)
+        log.info("🔧  reconcile finished in %.2fs (%d kept warm)",
+                 time.monotonic() - t0, len(actions["unchanged"]))
+        return actions
+
+    # ───────────── catalog ─────────────
+    def _notification_handler(self, name: str):
+        async def _handle(message: Any) -> None:
+            if (isinstance(message, ServerNotification)
+                    and isinstance(message.root, ToolListChangedNotification)):
+                log.info("🔄  '%s' tool list changed – catalog entry invalidated", name)
+                self._stale.add(name)
+        return _handle
+
+    def _set_tools(self, name: str, tools: List[Tool], persist: bool = True) -> None:
+        self._stale.discard(name)
+        old = self._tools.get(name)
+        same = old is not None and [t.model_dump() for t in old] == [t.model_dump() for t in tools]
+        if persist and name in self._from_snapshot:
+            self._from_snapshot.discard(name)
+            if same:
+                log.info("📸  '%s' catalog snapshot confirmed by live tools/list", name)
+            else:
+                log.warning("📸  '%s' catalog snapshot was outdated – replaced", name)
+        self._tools[name] = tools
+        if persist and self._store and name in self._cfg:
+            self._store.put(name, self._cfg[name], tools)
+        if not same:                 # keep the version (and downstream caches) stable
+            self.catalog_version = next(_catalog_versions)
+            self._rebuild_routes()
+
+    def _drop_tools(self, name: str) -> None:
+        self._stale.discard(name)
+        self._from_snapshot.discard(name)
+        if self._tools.pop(name, None) is not None:
+            self.catalog_version = next(_catalog_versions)
+            self._rebuild_routes()
+
+    async def _refresh(self, name: str) -> None:
+        """Re-list one server's tools; concurrent callers share a single request."""
+        task = self._refreshing.get(name)
+        if task is None:
+            async def _fetch() -> None:
                 try:
-                    await asyncio.wait_for(session.initialize(), timeout=INIT_CALL_TIMEOUT)
-                    tools = (await session.list_tools()).tools
-                    self._sessions[name] = session
-                    log.info("🟢  '%s' ready (%d tool%s)",
-                             name, len(tools), "" if len(tools) == 1 else "s")
-                    return
-                except asyncio.TimeoutError:
-                    log.warning("'%s' still warming – initialize() timed-out", name)
-                except Exception as exc:
-                    log.warning("'%s' still warming – %s", name, exc)
-                await asyncio.sleep(1)
-
-            raise TimeoutError(f"{name} boot timed-out after {BOOT_TIMEOUT}s")
+                    srv = self._servers[name]
+                    async with srv.limit:
+                        tools = (await srv.session.list_tools()).tools
+                    self._set_tools(name, tools)
+                finally:
+                    self._refreshing.pop(name, None)
+            task = self._refreshing[name] = asyncio.create_task(_fetch())
+        await asyncio.shield(task)
 
-        try:
-            await asyncio.wait_for(_boot(), timeout=BOOT_TIMEOUT + 5)
-        except Exception as exc:
-            log.error("❌  %s: %s", name, exc)
+    def _rebuild_routes(self) -> None:
+        """
+        Recompute the tool-name → server index.
+
+        Servers are walked in config order so the winner of a name clash is
+        deterministic (first configured server); every clash is logged and
+        kept in `collisions` instead of being resolved silently.
+        """
+        routes: Dict[str, str] = {}
+        owners: Dict[str, List[str]] = {}
+        for server in self._cfg:
+            for tool in self._tools.get(server, []):
+                owners.setdefault(tool.name, []).append(server)
+                routes.setdefault(tool.name, server)
+
+        collisions = {t: s for t, s in owners.items() if len(s) > 1}
+        for tool, servers in collisions.items():
+            if self.collisions.get(tool) != servers:
+                log.warning("⚠️  tool '%s' exposed by %s – routing to '%s'",
+                            tool, ", ".join(servers), servers[0])
+        self._routes, self.collisions = routes, collisions
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Per-server readiness, time-to-ready and supervisor counters."""
+        return {n: {**self._servers[n].status(),
+                    "tools_from_snapshot": n in self._from_snapshot}
+                for n in self._cfg if n in self._servers}
+
+    def _live(self) -> List[str]:
+        """Names of servers with an open session, in config order."""
+        return [n for n in self._cfg
+                if n in self._servers and self._servers[n].session is not None]
 
     # ───────────── public helpers ─────────────
+    async def drain(self, grace: float) -> bool:
+        """Wait up to `grace` seconds for in-flight calls; True if none remain."""
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout=grace)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
     async def close(self) -> None:
-        for h in self._ctxs: await h.exit()
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        await asyncio.gather(*(self._stop_server(n) for n in list(self._servers)))
+        self._tools = {}
+        self._stale = set()
+        self._from_snapshot = set()
+        self.catalog_version = next(_catalog_versions)
+        self._routes = {}
+        self.collisions = {}
+        self._flights = {}
         self.initialized = False
 
     async def list_tools(self) -> List[Tool]:
-        tools: List[Tool] = []
-        async with self._lock:
-            for s in self._sessions.values():
-                tools.extend((await s.list_tools()).tools)
-        return tools
+        """
+        Return the aggregated catalog. Only servers whose entry is missing or
+        invalidated are re-listed, and those refreshes run in parallel.
+        """
+        live = self._live()
+        missing = [n for n in live if n in self._stale or n not in self._tools]
+        if missing:
+            results = await asyncio.gather(*(self._refresh(n) for n in missing),
+                                           return_exceptions=True)
+            for n, res in zip(missing, results):
+                if isinstance(res, Exception):
+                    log.warning("'%s' tools/list refresh failed – %s", n, res)
+        # parked servers (lazy mode) keep advertising their snapshot entry
+        return [t for n in self._cfg for t in self._tools.get(n, [])]
+
+    def route(self, name: str) -> Optional[str]:
+        """Server currently answering for tool `name`."""
+        return self._routes.get(name)
+
+    def tool(self, name: str) -> Optional[Tool]:
+        """Catalog entry of tool `name` on the server it routes to."""
+        for tool in self._tools.get(self._routes.get(name, ""), []):
+            if tool.name == name:
+                return tool
+        return None
 
     async def call_tool(self, name: str, args: Dict[str, Any]) -> Any:
-        async with self._lock:
-            for s in self._sessions.values():
-                if any(t.name == name for t in (await s.list_tools()).tools):
-                    return (await s.call_tool(name, args)).content
-        raise ValueError(f"Tool '{name}' not found on any connected server")
\ No newline at end of file
+        return (await self.call_tool_result(name, args)).content
+
+    async def call_tool_result(self, name: str, args: Dict[str, Any]) -> CallToolResult:
+        """
+        Like `call_tool`, but returns the whole result (incl. `isError`).
+
+        Identical concurrent calls are coalesced: one request goes to the
+        server and every caller awaits it. A caller that is cancelled only
+        stops waiting; the shared call is cancelled once nobody waits on it.
+        Tools not annotated read-only/idempotent always run once per caller.
+        """
+        if mutates(self.tool(name)):
+            return await self._call(name, args)
+        key = tool_call_key(name, args)
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight(
+                asyncio.create_task(self._call(name, args)))
+            flight.task.add_done_callback(lambda _t, k=key, f=flight: self._land(k, f))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                self._land(key, flight)
+                flight.task.cancel()
+
+    def _land(self, key: str, flight: _Flight) -> None:
+        """Stop routing new callers to `flight` (done or abandoned)."""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def _call(self, name: str, args: Dict[str, Any]) -> CallToolResult:
+        srv = self._servers.get(self._routes.get(name, ""))
+        if srv is None:
+            raise ValueError(f"Tool '{name}' not found on any connected server")
+        self._inflight += 1
+        self._drained.clear()
+        srv.inflight += 1
+        srv.last_used = time.monotonic()
+        try:
+            await self._wake(srv)
+            if srv.session is None:
+                raise RuntimeError(f"Server '{srv.name}' for tool '{name}' is not available")
+            async with srv.limit:
+                return await srv.session.call_tool(name, args)
+        finally:
+            srv.inflight -= 1
+            srv.last_used = time.monotonic()
+            self._inflight -= 1
+            if not self._inflight:
+                self._drained.set()
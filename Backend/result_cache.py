@@ -0,0 +1,125 @@
+"""
+TTL + LRU cache for MCP tool results.
+
+Entries are keyed by server, tool name and canonicalised arguments. How long
+a tool's results live (and how many of them are kept) comes from a policy:
+
+    {
+      "tools":   {"get_crypto_price": {"ttl": 30, "max_entries": 200}},
+      "servers": {"github": {"ttl": 0}}            # ttl 0 → never cached
+    }
+
+A tool entry wins over its server's entry, which wins over the defaults.
+Without an explicit tool entry, only tools annotated readOnlyHint or
+idempotentHint are cached – unannotated tools are presumed to change state.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from mcp.types import Tool
+
+from mcp_client import mutates, tool_call_key
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TTL  = 0     # seconds; 0 = only tools/servers with a policy are cached
+MAX_ENTRIES  = 1024  # across all tools
+
+
+def load_policies(path: str | os.PathLike | None) -> Dict[str, Any]:
+    """Read a policy file; a missing or broken file means no policies."""
+    if not path:
+        return {}
+    try:
+        return json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as exc:
+        log.warning("ignoring unreadable cache policy %s – %s", path, exc)
+        return {}
+
+
+class ResultCache:
+    """Bounded LRU of tool results with a per-tool TTL and size cap."""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = MAX_ENTRIES,
+                 policies: Optional[Dict[str, Any]] = None):
+        policies = policies or {}
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._tool_policies: Dict[str, Dict[str, Any]] = policies.get("tools", {})
+        self._server_policies: Dict[str, Dict[str, Any]] = policies.get("servers", {})
+        # key → (expires_at, server, tool, value); oldest first
+        self._entries: "OrderedDict[str, Tuple[float, str, str, Any]]" = OrderedDict()
+        self._per_tool: Dict[str, int] = {}
+        self.hits = self.misses = self.evictions = 0
+
+    # ───────────── policy ─────────────
+    def policy(self, tool: str, server: Optional[str],
+               meta: Optional[Tool] = None) -> Tuple[float, Optional[int]]:
+        """(ttl, per-tool max entries) for `tool`; a ttl of 0 means don't cache."""
+        conf = self._tool_policies.get(tool)
+        if conf is None:
+            if mutates(meta):
+                return 0, None
+            conf = self._server_policies.get(server or "", {})
+        return float(conf.get("ttl", self.ttl)), conf.get("max_entries")
+
+    @staticmethod
+    def key(server: str, tool: str, args: Dict[str, Any]) -> str:
+        return f"{server}/{tool_call_key(tool, args)}"
+
+    # ───────────── lookup / store ─────────────
+    def lookup(self, key: str) -> Tuple[bool, Any]:
+        """(True, value) on a fresh hit, else (False, None)."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[3]
+        if entry is not None:
+            self._remove(key)
+        self.misses += 1
+        return False, None
+
+    def put(self, key: str, server: str, tool: str, value: Any,
+            ttl: float, max_entries: Optional[int] = None) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, server, tool, value)
+        self._per_tool[tool] = self._per_tool.get(tool, 0) + 1
+
+        if max_entries is not None and self._per_tool[tool] > max_entries:
+            oldest = next(k for k, e in self._entries.items() if e[2] == tool)
+            self._remove(oldest)
+            self.evictions += 1
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, server: Optional[str] = None) -> None:
+        """Forget everything cached for `server` (or for all servers)."""
+        for key in [k for k, e in self._entries.items() if server in (None, e[1])]:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        tool = self._entries.pop(key)[2]
+        self._per_tool[tool] -= 1
+        if not self._per_tool[tool]:
+            del self._per_tool[tool]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
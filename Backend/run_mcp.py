@@ -22,11 +22,17 @@ import traceback
 # ------------------------------------------------------------------ #
 NEEDED_PKGS = ("mcp>=0.9.0", "fastmcp>=0.9.0", "httpx")
 
+# Marker init.py drops into a venv it fully provisioned for this runner
+ENV_STAMP = ".trialrun-env"
+
 _VERSION_RE = re.compile(r"[<>=~!].*")  # matches first version spec symbol
 
 
 def _ensure_pkgs() -> None:
     """Install required packages if the base import is not found."""
+    if (pathlib.Path(sys.prefix) / ENV_STAMP).exists():
+        return                          # prepared env – nothing to resolve
+
     missing: list[str] = []
     for req in NEEDED_PKGS:
         module_name = _VERSION_RE.split(req, maxsplit=1)[0]  # "mcp>=0.9" -> "mcp"
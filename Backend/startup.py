@@ -6,11 +6,11 @@ Backend Startup Script – container entry-point
 
 Responsibilities
 ────────────────
-1. Call the central “handshake” endpoint to fetch the sandbox
-   configuration (MCP server list, system prompt, …).
-2. Feed that payload to `init_mcp()`, which writes `mcp.json`
-   and `.env` so the rest of the backend can boot.
-3. Launch the FastAPI app with Uvicorn.
+1. Launch the FastAPI app with Uvicorn.
+
+The handshake with the central API no longer happens here: the app's
+startup hook runs a single async boot pipeline (last-known `mcp.json`
+→ start servers ∥ handshake → reconcile), see `app.main._boot_pipeline`.
 """
 
 from __future__ import annotations
@@ -20,10 +20,8 @@ import logging
 import os
 import sys
 
-import requests
 import uvicorn
 from app.main import app
-from init import init_mcp  # ← NEW symbol name
 
 log = logging.getLogger("startup")
 logging.basicConfig(level=logging.INFO)
@@ -32,29 +30,13 @@ logging.basicConfig(level=logging.INFO)
 # ──────────────────────────────────────────────────────────
 async def main() -> None:
     sandbox_id      = os.getenv("SANDBOX_ID",)
-    central_api_url = os.getenv("CENTRAL_API_URL", "https://api-rough-bush-2430.fly.dev")
     base_url        = os.getenv("BASE_URL")
 
     log.info("Starting sandbox id=%s  base_url=%s", sandbox_id, base_url)
 
     # -----------------------------------------------------
-    # 1) Handshake – always try, but don’t crash on error
-    # -----------------------------------------------------
-    try:
-        log.info("⇢ handshake with central API …")
-        resp = requests.post(
-            f"{central_api_url}/handshake",
-            json={"sandbox_id": sandbox_id, "base_url": base_url},
-            timeout=15,
-        )
-        resp.raise_for_status()
-        payload = resp.json()          # may be new- or old-style
-        init_mcp(payload)              # writes mcp.json + .env
-    except Exception as exc:
-        log.exception("Handshake failed – continuing with local defaults (%s)", exc)
-
-    # -----------------------------------------------------
-    # 2) Launch FastAPI (blocks until Ctrl-C / SIGTERM)
+    # Launch FastAPI (blocks until Ctrl-C / SIGTERM); the
+    # handshake runs inside the app's boot pipeline
     # -----------------------------------------------------
     log.info("⇢ starting FastAPI on 0.0.0.0:8000")
     server = uvicorn.Server(
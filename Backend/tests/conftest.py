@@ -0,0 +1,31 @@
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+# Backend modules are flat (no package) – make them importable from tests/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# stdio MCP server whose only tool, sleep_<argv[1]>, sleeps for `seconds`
+SLOW_SERVER = textwrap.dedent("""
+    import asyncio, sys
+    from mcp.server.fastmcp import FastMCP
+
+    server = FastMCP("slow")
+
+    @server.tool(name=f"sleep_{sys.argv[1]}")
+    async def sleep(seconds: float, tag: int = 0) -> str:
+        await asyncio.sleep(seconds)
+        return f"slept {seconds}s ({tag})"
+
+    server.run()
+""")
+
+
+@pytest.fixture
+def slow_server(tmp_path):
+    """Path of a SLOW_SERVER script; launch it with the tool suffix as argv[1]."""
+    script = tmp_path / "slow_server.py"
+    script.write_text(SLOW_SERVER)
+    return script
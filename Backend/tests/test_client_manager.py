@@ -0,0 +1,33 @@
+"""
+MCPClientManager blue/green swaps: a replaced client is still cleaned up
+when the manager closes while that client is draining.
+"""
+
+import asyncio
+import sys
+
+from client_manager import MCPClientManager
+
+
+def test_close_stops_clients_still_draining_after_swap(slow_server):
+    async def _run():
+        mgr = MCPClientManager({"a": {"command": sys.executable,
+                                      "args": [str(slow_server), "a"]}})
+        await mgr.initialize()
+        assert await mgr.wait_ready(timeout=60)
+        old = mgr._core
+
+        # keep the old client busy so its retirement waits on the drain
+        call = asyncio.create_task(mgr.call_tool("sleep_a", {"seconds": 30}))
+        await asyncio.sleep(0.2)
+        await mgr.swap({"b": {"command": sys.executable,
+                              "args": [str(slow_server), "b"]}}, grace=60)
+        assert mgr._retiring
+
+        await mgr.close()
+        call.cancel()
+        await asyncio.gather(call, return_exceptions=True)
+        return old
+
+    old = asyncio.run(_run())
+    assert not old._servers, "retired client was left running"
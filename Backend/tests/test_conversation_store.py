@@ -0,0 +1,29 @@
+"""ConversationStore: persistence, sticky tool selection and size limits."""
+
+from conversation_store import ConversationStore
+
+EXCHANGE = [
+    {"role": "user", "content": "price of btc?"},
+    {"role": "assistant", "content": [{"type": "tool_use", "id": "t1",
+                                       "name": "get_price", "input": {}}]},
+    {"role": "user", "content": [{"type": "tool_result", "tool_use_id": "t1",
+                                  "content": "42"}]},
+    {"role": "assistant", "content": "BTC is at 42."},
+]
+
+
+def test_messages_and_tools_survive_a_restart(tmp_path):
+    db = tmp_path / "conversations.db"
+    ConversationStore(db).save("c1", EXCHANGE, ["get_price", "get_weather"])
+
+    store = ConversationStore(db)
+    assert store.load("c1") == EXCHANGE
+    assert store.tool_names("c1") == ["get_price", "get_weather"]
+    assert store.load("unknown") == [] and store.tool_names("unknown") == []
+
+
+def test_trimming_keeps_tool_use_and_result_together():
+    store = ConversationStore(max_messages=5)
+    store.save("c1", EXCHANGE + EXCHANGE)
+    kept = store.load("c1")
+    assert kept == EXCHANGE                  # whole oldest exchange dropped
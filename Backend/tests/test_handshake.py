@@ -0,0 +1,51 @@
+"""Conditional handshake polls: an unchanged config costs no normalise/disk write."""
+
+import asyncio
+import json
+
+import httpx
+
+from app import main
+
+CONFIG = {"settings": {"mcpServers": {"echo": {"command": "echo"}}},
+          "system_prompt": "be nice"}
+
+
+def test_304_short_circuits_without_touching_mcp_json(tmp_path, monkeypatch):
+    seen_if_none_match = []
+
+    def _respond(request: httpx.Request) -> httpx.Response:
+        seen_if_none_match.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=CONFIG, headers={"ETag": '"v1"'})
+
+    normalised = []
+
+    async def _normalise(servers, repo):
+        normalised.append(dict(servers))
+        return servers, {}
+
+    config_path = tmp_path / "mcp.json"
+    monkeypatch.setattr(main, "MCP_CONFIG_PATH", config_path)
+    monkeypatch.setattr(main, "normalise_servers", _normalise)
+    monkeypatch.setattr(main, "HANDSHAKE_ETAG", None)
+    monkeypatch.setattr(main, "HANDSHAKE_DIGEST", None)
+    monkeypatch.setattr(main, "http_client",
+                        httpx.AsyncClient(transport=httpx.MockTransport(_respond)))
+
+    async def _run():
+        first = await main._handshake()
+        written = config_path.stat().st_mtime_ns
+        polls = [await main._handshake(include_base_url=False, conditional=True)
+                 for _ in range(3)]
+        await main.http_client.aclose()
+        return first, written, polls
+
+    first, written, polls = asyncio.run(_run())
+    assert first == CONFIG["settings"]["mcpServers"]
+    assert json.loads(config_path.read_text())["mcpServers"] == first
+    assert polls == [None, None, None]
+    assert seen_if_none_match == [None, '"v1"', '"v1"', '"v1"']
+    assert len(normalised) == 1
+    assert config_path.stat().st_mtime_ns == written
@@ -0,0 +1,28 @@
+"""Dependency sets for run_mcp.py launches: requirements.txt and pyproject.toml."""
+
+import init
+from run_mcp import NEEDED_PKGS
+
+
+def test_dependency_set_reads_requirements_and_pyproject(tmp_path):
+    repo = tmp_path / "repo"
+    script = repo / "src" / "server.py"
+    script.parent.mkdir(parents=True)
+    script.write_text("")
+    (script.parent / "requirements.txt").write_text("httpx>=0.27  # client\n-r more.txt\n")
+    (repo / "pyproject.toml").write_text(
+        '[project]\nname = "weather"\ndependencies = ["fastmcp>=2", "pydantic"]\n'
+        "[tool.uv]\ndev-dependencies = [\"pytest\"]\n"
+    )
+
+    deps = init._dependency_set(script, repo)
+
+    assert set(deps) == {*NEEDED_PKGS, "httpx>=0.27", "fastmcp>=2", "pydantic"}
+
+
+def test_dependency_set_survives_a_broken_pyproject(tmp_path):
+    script = tmp_path / "server.py"
+    script.write_text("")
+    (tmp_path / "pyproject.toml").write_text("[project\n")
+
+    assert init._dependency_set(script, None) == sorted(NEEDED_PKGS)
@@ -0,0 +1,155 @@
+"""
+MCPMultiClient against real stdio servers: calls to different servers run
+in parallel, and calls to one server are pipelined on its session.
+"""
+
+import asyncio
+import sys
+import textwrap
+import time
+
+import pytest
+
+import mcp_client
+from mcp_client import MCPMultiClient
+
+N = 4          # fake servers / concurrent calls
+DELAY = 1.0    # seconds each tool call sleeps
+
+
+@pytest.fixture
+def servers(slow_server):
+    return {f"s{i}": {"command": sys.executable, "args": [str(slow_server), str(i)]}
+            for i in range(N)}
+
+
+async def _timed_calls(cfg, calls):
+    """Boot `cfg`, run `calls` ([(tool, args)]) concurrently, return wall time."""
+    client = MCPMultiClient(cfg)
+    await client.initialize()
+    try:
+        assert await client.wait_ready(timeout=60)
+        assert all(s["state"] == "ready" for s in client.status().values())
+        t0 = time.monotonic()
+        results = await asyncio.gather(*(client.call_tool(n, a) for n, a in calls))
+        elapsed = time.monotonic() - t0
+        assert all("slept" in r[0].text for r in results)
+        return elapsed
+    finally:
+        await client.close()
+
+
+def test_calls_to_n_servers_take_about_one_call(servers):
+    calls = [(f"sleep_{i}", {"seconds": DELAY}) for i in range(N)]
+    elapsed = asyncio.run(_timed_calls(servers, calls))
+    assert elapsed < DELAY * N / 2, f"{N} servers took {elapsed:.2f}s"
+
+
+def test_calls_to_one_server_are_pipelined(servers):
+    calls = [("sleep_0", {"seconds": DELAY, "tag": i}) for i in range(N)]
+    elapsed = asyncio.run(_timed_calls({"s0": servers["s0"]}, calls))
+    assert elapsed < DELAY * N / 2, f"{N} pipelined calls took {elapsed:.2f}s"
+
+
+def test_child_that_exits_during_boot_fails_fast(monkeypatch):
+    monkeypatch.setattr(mcp_client, "RESTART_BASE", 0.01)
+
+    async def _boot():
+        client = MCPMultiClient({"dead": {"command": sys.executable,
+                                          "args": ["-c", "import sys; sys.exit(1)"]}})
+        await client.initialize()
+        try:
+            t0 = time.monotonic()
+            assert await client.wait_ready(timeout=30)
+            elapsed, status = time.monotonic() - t0, client.status()["dead"]
+            # never-ready servers are retried a bounded number of times
+            await asyncio.wait_for(client._servers["dead"].task, timeout=30)
+            return elapsed, status, client.status()["dead"]
+        finally:
+            await client.close()
+
+    elapsed, status, final = asyncio.run(_boot())
+    assert elapsed < 10, f"crashing child took {elapsed:.1f}s to fail"
+    assert status["state"] == "failed"
+    assert "exited" in status["last_failure"]
+    assert final["state"] == "failed"
+    assert final["restarts"] == mcp_client.BOOT_RESTARTS
+
+
+COUNTER_SERVER = textwrap.dedent("""
+    import asyncio
+    from mcp.server.fastmcp import FastMCP
+    from mcp.types import ToolAnnotations
+
+    server = FastMCP("counter")
+    calls = {"read": 0, "write": 0, "plain": 0}
+
+    @server.tool(annotations=ToolAnnotations(readOnlyHint=True))
+    async def read() -> int:
+        await asyncio.sleep(0.5)
+        calls["read"] += 1
+        return calls["read"]
+
+    @server.tool(annotations=ToolAnnotations(readOnlyHint=False))
+    async def write() -> int:
+        await asyncio.sleep(0.5)
+        calls["write"] += 1
+        return calls["write"]
+
+    @server.tool()                      # no annotations: presumed to change state
+    async def plain() -> int:
+        await asyncio.sleep(0.5)
+        calls["plain"] += 1
+        return calls["plain"]
+
+    server.run()
+""")
+
+
+def test_identical_calls_coalesce_only_for_read_only_tools(tmp_path):
+    script = tmp_path / "counter_server.py"
+    script.write_text(COUNTER_SERVER)
+
+    async def _run():
+        client = MCPMultiClient({"c": {"command": sys.executable, "args": [str(script)]}})
+        await client.initialize()
+        try:
+            assert await client.wait_ready(timeout=60)
+            reads = await asyncio.gather(*(client.call_tool("read", {}) for _ in range(3)))
+            writes = await asyncio.gather(*(client.call_tool("write", {}) for _ in range(3)))
+            plain = await asyncio.gather(*(client.call_tool("plain", {}) for _ in range(3)))
+            return ([r[0].text for r in reads], sorted(w[0].text for w in writes),
+                    sorted(p[0].text for p in plain))
+        finally:
+            await client.close()
+
+    reads, writes, plain = asyncio.run(_run())
+    assert reads == ["1", "1", "1"]          # one request, shared result
+    assert writes == ["1", "2", "3"]         # every caller got its own side effect
+    assert plain == ["1", "2", "3"]          # unannotated: presumed to change state
+
+
+def test_reconciling_away_parked_servers_drops_their_tools(tmp_path, slow_server):
+    cfg = {f"s{i}": {"command": sys.executable, "args": [str(slow_server), str(i)]}
+           for i in range(3)}
+    catalog = tmp_path / "catalog.json"
+
+    async def _boot(lazy):
+        client = MCPMultiClient(dict(cfg), lazy=lazy, catalog_path=str(catalog))
+        await client.initialize()
+        assert await client.wait_ready(timeout=60)
+        return client
+
+    async def _run():
+        await (await _boot(lazy=False)).close()      # writes the catalog snapshot
+        client = await _boot(lazy=True)              # every server parked
+        try:
+            assert {s["state"] for s in client.status().values()} == {"idle"}
+            await client.reconcile({"s2": cfg["s2"]})
+            return set(client._tools), {t.name for t in await client.list_tools()}
+        finally:
+            await client.close()
+
+    servers, tools = asyncio.run(_run())
+    assert servers == {"s2"}
+    assert tools == {"sleep_2"}
@@ -0,0 +1,52 @@
+"""BM25 tool selection: tokenisation and ranking against the catalog."""
+
+from tool_index import ToolIndex, tokenize
+
+TOOLS = [
+    {"name": "search_repositories", "description": "Search GitHub repositories"},
+    {"name": "getTranscript", "description": "Fetch the transcript of a YouTube video"},
+    {"name": "get_weather", "description": "Weather forecast for a city"},
+]
+
+
+def test_camel_case_words_match_their_joined_form():
+    assert "github" in tokenize("Search GitHub repositories")
+    assert "youtube" in tokenize("a YouTube video")
+    assert {"gettranscript", "transcript"} <= set(tokenize("getTranscript"))
+
+
+def test_user_spelling_finds_brand_named_tools():
+    index = ToolIndex()
+    index.sync(TOOLS, version=1)
+    assert set(index.scores("show me my github repos")) == {"search_repositories"}
+    assert set(index.scores("summarise this youtube link")) == {"getTranscript"}
+
+
+def _names(tools):
+    return [t["name"] for t in tools]
+
+
+def test_selection_only_grows_within_a_conversation():
+    index = ToolIndex()
+    index.sync(TOOLS, version=1)
+    sent, first = index.select(TOOLS, "github repos", k=1)
+    assert _names(sent) == first == ["search_repositories"]
+
+    # a later turn about something else adds to the selection, never swaps it
+    sent, later = index.select(TOOLS, "weather in Paris", k=1, previous=first)
+    assert _names(sent) == later == ["search_repositories", "get_weather"]
+
+    # nothing matches: keep what the conversation already has
+    sent, idle = index.select(TOOLS, "thanks!", k=1, previous=later)
+    assert _names(sent) == idle == later
+
+
+def test_greeting_first_does_not_pin_the_whole_catalog():
+    index = ToolIndex()
+    index.sync(TOOLS, version=1)
+    sent, remembered = index.select(TOOLS, "hi there", k=1)
+    assert _names(sent) == _names(TOOLS)         # fallback: everything is offered …
+    assert remembered == []                      # … but nothing is made sticky
+
+    sent, remembered = index.select(TOOLS, "weather in Paris", k=1, previous=remembered)
+    assert _names(sent) == remembered == ["get_weather"]
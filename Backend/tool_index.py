@@ -0,0 +1,152 @@
+"""
+Local BM25 index over the tool catalog.
+
+Chat requests only send the model the tools relevant to the conversation:
+tool names and descriptions are indexed once per catalog version (only the
+tools that changed are re-tokenised) and ranked against the recent user
+text. No network, no embeddings – plain lexical scoring.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+K1 = 1.5             # BM25 term-frequency saturation
+B = 0.75             # BM25 length normalisation
+NAME_WEIGHT = 2      # tool-name tokens count this many times
+QUERY_MESSAGES = 6   # recent messages that make up the query
+
+_RUN = re.compile(r"[A-Za-z0-9]+")                       # one word as written
+_PART = re.compile(r"[A-Za-z][a-z]+|[A-Z]+(?![a-z])|\d+")  # its camelCase parts
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do for from get give how i in is it me my "
+    "of on or please show tell that the this to use what with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-case word tokens; splits snake_case and kebab-case. A camelCase
+    word yields both the joined word and its parts, so "GitHub" matches a
+    query for "github" as well as "hub". Stopwords are dropped last.
+    """
+    tokens: List[str] = []
+    for run in _RUN.findall(text or ""):
+        tokens.append(run.lower())
+        parts = _PART.findall(run)
+        if len(parts) > 1:
+            tokens += [p.lower() for p in parts]
+    return [t for t in tokens if t not in _STOPWORDS]
+
+
+def conversation_text(messages: List[Dict[str, Any]], last: int = QUERY_MESSAGES) -> str:
+    """Plain text of the last few user messages (tool results are skipped)."""
+    parts: List[str] = []
+    for msg in messages[-last:]:
+        if msg.get("role") != "user":
+            continue
+        content = msg.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts += [b.get("text", "") for b in content
+                      if isinstance(b, dict) and b.get("type") == "text"]
+    return "\n".join(parts)
+
+
+def tools_in(messages: List[Dict[str, Any]]) -> Set[str]:
+    """Names of tools already called in `messages` (tool_use blocks)."""
+    return {
+        b.get("name") for m in messages if isinstance(m.get("content"), list)
+        for b in m["content"] if isinstance(b, dict) and b.get("type") == "tool_use"
+    }
+
+
+class ToolIndex:
+    """BM25 over Anthropic tool definitions, kept in sync by catalog version."""
+
+    def __init__(self) -> None:
+        self._version: Optional[int] = None
+        self._fingerprints: Dict[str, str] = {}   # tool → hash of indexed text
+        self._docs: Dict[str, Counter] = {}       # tool → term frequencies
+        self._lengths: Dict[str, int] = {}
+        self._df: Counter = Counter()             # term → documents containing it
+
+    def sync(self, tools: List[Dict[str, Any]], version: int) -> None:
+        """Re-index only the tools added, removed or changed since last sync."""
+        if version == self._version:
+            return
+        current = {t["name"]: t for t in tools}
+        changed = 0
+        for name in [n for n in self._docs if n not in current]:
+            self._remove(name)
+            changed += 1
+        for name, tool in current.items():
+            text = f"{name}\n{tool.get('description', '')}"
+            fingerprint = hashlib.sha1(text.encode()).hexdigest()
+            if self._fingerprints.get(name) == fingerprint:
+                continue
+            if name in self._docs:
+                self._remove(name)
+            terms = tokenize(name) * NAME_WEIGHT + tokenize(tool.get("description", ""))
+            self._docs[name] = Counter(terms)
+            self._lengths[name] = len(terms)
+            self._df.update(set(terms))
+            self._fingerprints[name] = fingerprint
+            changed += 1
+        self._version = version
+        if changed:
+            log.info("tool index v%d: %d tool(s) re-indexed, %d total",
+                     version, changed, len(self._docs))
+
+    def _remove(self, name: str) -> None:
+        self._df.subtract(set(self._docs.pop(name)))
+        self._df += Counter()                      # drop zero counts
+        self._lengths.pop(name, None)
+        self._fingerprints.pop(name, None)
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """BM25 score of every tool with at least one query term."""
+        terms = set(tokenize(query))
+        n = len(self._docs)
+        if not terms or not n:
+            return {}
+        avgdl = sum(self._lengths.values()) / n or 1.0
+        out: Dict[str, float] = {}
+        for name, tf in self._docs.items():
+            score = 0.0
+            for term in terms & tf.keys():
+                df = self._df[term]
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                f = tf[term]
+                score += idf * f * (K1 + 1) / (f + K1 * (1 - B + B * self._lengths[name] / avgdl))
+            if score > 0:
+                out[name] = score
+        return out
+
+    def select(self, tools: List[Dict[str, Any]], query: str, k: int,
+               pinned: Iterable[str] = (),
+               previous: Iterable[str] = ()) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        (tools to send, names to remember as the conversation's selection).
+
+        The selection is the top-`k` tools for `query` plus every `pinned`
+        one and everything `previous`ly selected – it only ever grows – in
+        catalog order, so the request prefix stays byte-stable. The full
+        list is sent when k is off, the catalog is small or nothing matches
+        on a conversation's first turn, but that fallback is never
+        remembered, so a greeting doesn't pin the whole catalog.
+        """
+        ranked = sorted(self.scores(query).items(), key=lambda kv: -kv[1]) if k > 0 else []
+        keep = {name for name, _ in ranked[:k]} | set(pinned) | set(previous)
+        selection = [t for t in tools if t["name"] in keep]
+        if k <= 0 or len(tools) <= k or not (ranked or set(previous)):
+            return tools, [t["name"] for t in selection]
+        return selection, [t["name"] for t in selection]